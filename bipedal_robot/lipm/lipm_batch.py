@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+import numpy as np
+import matplotlib.pyplot as plt
+
+class BatchLinearInvertedPendulum(object):
+    gravity = 9.8 # gravity
+
+    # height, alpha : scalar or (N,) per-pendulum COG height and regulator gain
+    def __init__(self, height = 1.5, alpha = 3.0, dt = 0.01):
+        self.height = np.atleast_1d(np.asarray(height, dtype=np.float64))
+        self.alpha = np.atleast_1d(np.asarray(alpha, dtype=np.float64))
+        self.omega2 = self.gravity / self.height
+        self.omega = np.sqrt(self.omega2)
+        self.dT = dt
+
+        # exact zero-order-hold transition of each pendulum
+        ch = np.cosh(self.omega * dt)
+        sh = np.sinh(self.omega * dt)
+        self.Ad = np.array([[ch, sh / self.omega], [self.omega * sh, ch]]) # (2, 2, N)
+        self.Bd = np.array([1 - ch, -self.omega * sh]) # (2, N)
+
+    # u = u_ref - F (X_ref - X), F = alpha [1, 1/omega^2]
+    def bestCOG_Regulator(self, X, X_ref, u_ref):
+        return u_ref - self.alpha * ((X_ref[:, 0] - X[:, 0]) + (X_ref[:, 1] - X[:, 1]) / self.omega2)
+
+    # X0, X_ref : (N, 2) [x, x_dot], u_ref : (N,)
+    # return X (N, T, 2) and u (N, T)
+    def simulate(self, X0, X_ref, u_ref, steps):
+        N = np.broadcast_shapes(np.shape(X0)[:-1], np.shape(X_ref)[:-1], np.shape(u_ref), self.height.shape, self.alpha.shape)[0]
+        X0 = np.broadcast_to(X0, (N, 2))
+        X_ref = np.broadcast_to(X_ref, (N, 2))
+        u_ref = np.broadcast_to(u_ref, (N,))
+        Ad = np.broadcast_to(self.Ad, (2, 2, N))
+        Bd = np.broadcast_to(self.Bd, (2, N))
+
+        X = np.empty((N, steps, 2))
+        u = np.empty((N, steps))
+        X[:, 0] = X0
+        for k in range(steps):
+            u[:, k] = self.bestCOG_Regulator(X[:, k], X_ref, u_ref)
+            if k + 1 < steps:
+                x = X[:, k, 0]
+                x_dot = X[:, k, 1]
+                X[:, k+1, 0] = Ad[0, 0] * x + Ad[0, 1] * x_dot + Bd[0] * u[:, k]
+                X[:, k+1, 1] = Ad[1, 0] * x + Ad[1, 1] * x_dot + Bd[1] * u[:, k]
+        return X, u
+
+if __name__ == '__main__':
+    dt = 0.01
+    period = 4
+    steps = (int) (period / dt)
+    alpha = np.linspace(0.5, 6.0, 12)
+    plant = BatchLinearInvertedPendulum(1.5, alpha, dt)
+    X, u = plant.simulate(np.zeros(2), np.array([0.5, 0.]), 0.5, steps)
+
+    t = np.arange(steps) * dt
+    for i in range(alpha.size):
+        plt.plot(t, X[i, :, 0], label='alpha = {0:.1f}'.format(alpha[i]))
+    plt.xlabel('t')
+    plt.ylabel('COG position')
+    plt.legend()
+    plt.show()
@@ -3,9 +3,11 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 
-from scipy.integrate import odeint
 import scipy.spatial as ssp
 
+from phase_portrait import vector_field, normalize, LTIFlow, boundary_crossings, first_crossings
+from viability import classify
+
 class LinearInvertedPendulum(object):
     gravity = 9.8 # gravity
 
@@ -16,6 +18,7 @@ class LinearInvertedPendulum(object):
 
         self.A = np.array([[0, 1],[self.omega2, 0]]) # state matrix
         self.B = np.array([[0],[-self.omega2]]) # input matrix
+        self.lti_flow = None
 
     
     def init_state(self, x, x_ref, u_ref, dt = 0.01, dxot = 0., dxdot = 0):
@@ -46,24 +49,24 @@ class LinearInvertedPendulum(object):
     def get_omega(self):
         return self.omega
 
+    # exact trajectories (N, T, 2) of free motion from states X0 (N, 2)
+    def flow(self, X0, t):
+        if self.lti_flow is None:
+            self.lti_flow = LTIFlow(self.A)
+        return self.lti_flow.evaluate(X0, t)
+
     def calc_dX(self, X, t = 0):
         if X.shape == np.zeros((self.A[0].size, 1)).shape:# normal
             return self.A @ X
         elif  X.ndim == 1: # for odeint
             return self.A @ X.T
         else: # for meshgrid
-            dxot = np.zeros((X[:,0,0].size,X[0,0,:].size, X[0,:,0].size), dtype=np.float64)
-            for i in range(X[:,0,0].size):
-                x_tmp =  np.empty((0,X[0,0,:].size, X[0,:,0].size), dtype=np.float64)
-                for j in range(X[:,0,0].size):
-                    x_tmp = np.append(x_tmp, np.array([self.A[j,i] * X[i]]), axis = 0)    
-                dxot += x_tmp
-            return dxot
+            return vector_field(self.A, X)
 
+# point : (dim,) or (N, dim), hull.equations rows are [normal, offset]
 def point_in_hull(point, hull, tolerance=1e-6):
-  return all(
-    (np.dot(eq[:-1], point) + eq[-1] <= tolerance)
-    for eq in hull.equations)
+  inside = classify(hull.equations[:, :-1], -hull.equations[:, -1], np.atleast_2d(point), tolerance)
+  return inside if np.ndim(point) > 1 else inside[0]
 
 if __name__ == '__main__':
     x_ref = np.array([[0.5],[0.]])
@@ -100,7 +103,6 @@ if __name__ == '__main__':
     #ode
     time = np.arange(0, 16, 0.01)
     step = 20 
-    count = 0
 
     tri = plt.Polygon(((0.0,0.0),(limit,limit),(-limit,limit)),fc="#ff0000",alpha=0.2)
     ax.add_patch(tri)
@@ -111,57 +113,49 @@ if __name__ == '__main__':
     tri = plt.Polygon(((0.0,0.0),(-limit,limit),(-limit,-limit)),fc="#0000ff",alpha=0.2)
     ax.add_patch(tri)
 
-    for xi in np.linspace(x_min, x_max, step):
-        for xj in np.linspace(dx_min, dx_max, step):
-            if (xj == dx_min and xi > 0)  or (xj == dx_max and xi < 0) or\
-               (xi ==  x_min and xj > 0)  or (xi ==  x_max and xj < 0):
-                count += 1
-                x_data = odeint(plant.calc_dX, [xi, xj], time)
-                plt.plot(x_data[:,0], x_data[:,1], color='k', linewidth = 0.6)
-                # if x_data[-1,0] < 0.1 or x_data[-1,1] < 0.1:
-                #     point_in_hull([xi, xj], hull)
-                if (count%2 == 0 and xi > 0) or (count%2 == 1 and xi < 0):
-                    ss = []
-                    for s in range(time.size-1):
-                        if (x_data[s,1]-dx_max)*(x_data[s+1,1]-dx_max) <= 0 or (x_data[s,1]-dx_min)*(x_data[s+1,1]-dx_min) <= 0 or \
-                           (x_data[s,0]- x_max)*(x_data[s+1,0]- x_max) <= 0 or (x_data[s,0]- x_min)*(x_data[s+1,0]- x_min) <= 0:
-                            ss.append(s)
-                    l = ss[1] - ss[0]
-                    k = 0#int(l/15)
-                    if  (abs(x_data[ss[0],1] + x_data[ss[1],1])/2 > 1 and abs(x_data[ss[0],0] - x_data[ss[1],0]) > 4) or\
-                        (abs(x_data[ss[0],0] + x_data[ss[1],0])/2 > 1 and abs(x_data[ss[0],1] - x_data[ss[1],1]) > 4):
-                        X = np.array([x_data[ss[0]+k,0], x_data[ss[0]+k,1]])
-                        dX = plant.calc_dX(X)
-                        dX0_nr = dX[0] / (np.sqrt(dX[0]**2 + dX[1]**2) + 1e-6)
-                        dX1_nr = dX[1] / (np.sqrt(dX[0]**2 + dX[1]**2) + 1e-6)
-                        plt.quiver(X[0]-dX0_nr/3+dX0_nr/2, X[1]-dX1_nr/3+dX1_nr/2, dX0_nr, dX1_nr, color='b')
-                        X = np.array([x_data[ss[1]-k,0], x_data[ss[1]-k,1]])
-                        dX = plant.calc_dX(X)
-                        dX0_nr = dX[0] / (np.sqrt(dX[0]**2 + dX[1]**2) + 1e-6)
-                        dX1_nr = dX[1] / (np.sqrt(dX[0]**2 + dX[1]**2) + 1e-6)
-                        plt.quiver(X[0]-dX0_nr/3-dX0_nr/2, X[1]-dX1_nr/3-dX1_nr/2, dX0_nr, dX1_nr, color='b')
-                    if (abs(x_data[ss[0],1] + x_data[ss[1],1])/2 > 1 and abs(x_data[int((ss[0]+ss[1])/2),1]) < 5) or \
-                       (abs(x_data[ss[0],0] + x_data[ss[1],0])/2 > 1 and abs(x_data[int((ss[0]+ss[1])/2),0]) < 5):
-                        X = np.array([x_data[int((ss[0]+ss[1])*1/4),0], x_data[int((ss[0]+ss[1])*1/4),1]])
-                        dX = plant.calc_dX(X)
-                        dX0_nr = dX[0] / (np.sqrt(dX[0]**2 + dX[1]**2) + 1e-6)
-                        dX1_nr = dX[1] / (np.sqrt(dX[0]**2 + dX[1]**2) + 1e-6)
-                        plt.quiver(X[0]-dX0_nr/3, X[1]-dX1_nr/3, dX0_nr, dX1_nr, color='b')
-                        X = np.array([x_data[int((ss[0]+ss[1])*3/4),0], x_data[int((ss[0]+ss[1])*3/4),1]])
-                        dX = plant.calc_dX(X)
-                        dX0_nr = dX[0] / (np.sqrt(dX[0]**2 + dX[1]**2) + 1e-6)
-                        dX1_nr = dX[1] / (np.sqrt(dX[0]**2 + dX[1]**2) + 1e-6)
-                        plt.quiver(X[0]-dX0_nr/3, X[1]-dX1_nr/3, dX0_nr, dX1_nr, color='b')
-                    if abs(x_data[ss[0],1] - x_data[ss[1],1]) > 1 or abs(x_data[ss[0],0] - x_data[ss[1],0]) > 1:
-                        X = np.array([x_data[int((ss[0]+ss[1])/2),0], x_data[int((ss[0]+ss[1])/2),1]])
-                        dX = plant.calc_dX(X)
-                        dX0_nr = dX[0] / (np.sqrt(dX[0]**2 + dX[1]**2) + 1e-6)
-                        dX1_nr = dX[1] / (np.sqrt(dX[0]**2 + dX[1]**2) + 1e-6)
-                        plt.quiver(X[0]-dX0_nr/3, X[1]-dX1_nr/3, dX0_nr, dX1_nr, color='b')
-    x_data = odeint(plant.calc_dX, [+1e-3, +1e-3], time)
-    plt.plot(x_data[:,0], x_data[:,1], color='k', linewidth = 0.6)
-    x_data = odeint(plant.calc_dX, [-1e-3, -1e-3], time)
-    plt.plot(x_data[:,0], x_data[:,1], color='k', linewidth = 0.6)
+    # start points on the box boundary flowing inward
+    xi, xj = np.meshgrid(np.linspace(x_min, x_max, step), np.linspace(dx_min, dx_max, step), indexing='ij')
+    xi = xi.ravel()
+    xj = xj.ravel()
+    start = ((xj == dx_min) & (xi > 0)) | ((xj == dx_max) & (xi < 0)) | \
+            ((xi ==  x_min) & (xj > 0)) | ((xi ==  x_max) & (xj < 0))
+    seeds = np.stack((xi[start], xj[start]), axis=1)
+    count = np.arange(1, seeds.shape[0] + 1)
+
+    # all seeds and the two separatrix neighbours evaluated together
+    seeds = np.vstack((seeds, [[+1e-3, +1e-3], [-1e-3, -1e-3]]))
+    x_data = plant.flow(seeds, time)
+    plt.plot(x_data[:,:,0].T, x_data[:,:,1].T, color='k', linewidth = 0.6)
+    x_data = x_data[:-2]
+    seeds = seeds[:-2]
+
+    # arrows on every other trajectory, placed between its first two boundary crossings
+    arrow = ((count%2 == 0) & (seeds[:,0] > 0)) | ((count%2 == 1) & (seeds[:,0] < 0))
+    ss = first_crossings(boundary_crossings(x_data, [x_min, dx_min], [x_max, dx_max]), 2)
+    arrow &= ss[:,1] >= 0
+    x_data = x_data[arrow]
+    s0 = ss[arrow,0]
+    s1 = ss[arrow,1]
+    n = np.arange(x_data.shape[0])
+    first = x_data[n, s0]
+    last = x_data[n, s1]
+    mid = x_data[n, (s0+s1)//2]
+
+    def quiver(index, points, shift):
+        X = points[index].T
+        dX = normalize(vector_field(plant.A, X))
+        plt.quiver(X[0]-dX[0]/3+shift*dX[0], X[1]-dX[1]/3+shift*dX[1], dX[0], dX[1], color='b')
+
+    across = ((abs(first[:,1] + last[:,1])/2 > 1) & (abs(first[:,0] - last[:,0]) > 4)) | \
+             ((abs(first[:,0] + last[:,0])/2 > 1) & (abs(first[:,1] - last[:,1]) > 4))
+    quiver(across, first, 1/2)
+    quiver(across, last, -1/2)
+    inside = ((abs(first[:,1] + last[:,1])/2 > 1) & (abs(mid[:,1]) < 5)) | \
+             ((abs(first[:,0] + last[:,0])/2 > 1) & (abs(mid[:,0]) < 5))
+    quiver(inside, x_data[n, ((s0+s1)*1/4).astype(int)], 0)
+    quiver(inside, x_data[n, ((s0+s1)*3/4).astype(int)], 0)
+    long = (abs(first[:,1] - last[:,1]) > 1) | (abs(first[:,0] - last[:,0]) > 1)
+    quiver(long, mid, 0)
     X = np.array([[[-2,2],[-2,2]],[[2,2],[-2,-2]]])
     dX = plant.calc_dX(X)
     dX0_nr = dX[0] / (np.sqrt(dX[0]**2 + dX[1]**2) + 1e-6)
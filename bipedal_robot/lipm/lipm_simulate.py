@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-import matplotlib.patches as patches
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'simulation'))
+from lti import LinearSystem
+from playback import Playback
 
 class LinearInvertedPendulum(object):
     gravity = 9.8 # gravity
 
-    def __init__(self, height  = 1.5, weight = 50):
+    def __init__(self, height  = 1.5, weight = 50, alpha = 3.0):
         self.height = height
+        self.alpha = alpha # regulator gain
         self.omega2 = self.gravity / self.height
         self.omega = np.sqrt(self.omega2)
 
@@ -16,11 +21,12 @@ class LinearInvertedPendulum(object):
         self.B = np.array([[0],[-self.omega2]]) # input matrix
 
     
-    def init_state(self, x, x_ref, u_ref, dt = 0.01, x_dot = 0., x_ddot = 0):
+    def init_state(self, x, x_ref, u_ref, dt = 0.01, x_dot = 0., x_ddot = 0, method = 'zoh'):
         self.X = np.array([[x], [x_dot]])
         self.X_dot = np.array([[x_dot], [x_ddot]])
         self.u = self.bestCOG_Regulator(x_ref, u_ref)
         self.dT = dt
+        self.system = LinearSystem(self.A, self.B, dt, method)
 
     def do_action(self, x_ref, u_ref):
         self.u = self.bestCOG_Regulator(x_ref, u_ref)
@@ -28,10 +34,9 @@ class LinearInvertedPendulum(object):
 
     def update_state(self):
         self.X_dot = self.A @ self.X + self.B @ self.u
-        self.X =self.X + self.X_dot * self.dT 
+        self.X = self.system.step(self.X, self.u)
 
     def bestCOG_Regulator(self, x_ref, u_ref):
-        self.alpha = 3.0
         self.F = self.alpha * np.array([[1.0, 1.0/self.omega2]])
         return u_ref - self.F @ (x_ref - self.X)
 
@@ -41,41 +46,63 @@ class LinearInvertedPendulum(object):
     def get_u(self):
         return self.u
 
-def video(x_hs, u_hs, h, t, fig):
+    # closed-form COG state [x, x_dot] after time t with the ZMP held at u
+    # x, x_dot, u and t broadcast against each other
+    def analytic_state(self, x, x_dot, u, t):
+        ch = np.cosh(self.omega * t)
+        sh = np.sinh(self.omega * t)
+        return u + (x - u) * ch + x_dot / self.omega * sh, (x - u) * self.omega * sh + x_dot * ch
+
+    # COG trajectory for a piecewise-constant ZMP, one segment per footstep
+    # zmp, duration : (..., S) ZMP position and length of each segment,
+    #                 leading dimensions evaluate candidate plans at once
+    # t : (T,) sample times from the start of the first segment
+    # return X (2, ..., T) and the ZMP at each sample (..., T)
+    def analytic_rollout(self, X0, zmp, duration, t):
+        zmp, duration = np.broadcast_arrays(np.asarray(zmp, dtype=np.float64), np.asarray(duration, dtype=np.float64))
+        t = np.asarray(t, dtype=np.float64)
+        S = zmp.shape[-1]
+        start = np.zeros(zmp.shape)
+        start[..., 1:] = np.cumsum(duration[..., :-1], axis=-1)
+
+        # state at each segment boundary
+        x = np.empty(zmp.shape)
+        x_dot = np.empty(zmp.shape)
+        xb = np.full(zmp.shape[:-1], float(X0[0][0]))
+        vb = np.full(zmp.shape[:-1], float(X0[1][0]))
+        for s in range(S):
+            x[..., s] = xb
+            x_dot[..., s] = vb
+            xb, vb = self.analytic_state(xb, vb, zmp[..., s], duration[..., s])
+
+        # segment of each sample, the last one extends past the plan
+        index = np.sum(start[..., np.newaxis, :] <= t[:, np.newaxis], axis=-1) - 1
+        index = np.clip(index, 0, S - 1)
+        tau = t - np.take_along_axis(start, index, axis=-1)
+        u = np.take_along_axis(zmp, index, axis=-1)
+        X = self.analytic_state(np.take_along_axis(x, index, axis=-1),
+                                np.take_along_axis(x_dot, index, axis=-1), u, tau)
+        return np.array(X), u
+
+def video(x_hs, u_hs, h, t, fig, decimate = 1):
     ax = fig.add_subplot(221, aspect='equal', autoscale_on=False, xlim=(-2, 2), ylim=(-0.5, 3.5))
     ax.grid()
 
-    #line
-    line, = ax.plot([], [], '-r', lw=2)
-    time_text = ax.text(0.02, 0.95, 'time = 0.0', transform=ax.transAxes)
-
-    # cog circle
-    circle, = ax.plot([], [], '-r', lw=2)
-    radius = 0.1
-    angles = np.arange(0.0, np.pi * 2.0, np.radians(3.0))
-    ox = radius * np.cos(angles) 
-    oy = radius * np.sin(angles)
-
-    rectangle = ax.add_patch(patches.Rectangle(xy=(u_hs[0]-0.25/2, -0.25/2), width=0.25, height=0.25,  ec='r', fill=False, lw=2))
-
-    def init():
-        line.set_data([], [])
-        circle.set_data([], [])
-        rectangle.set_xy([u_hs[0]-0.25/2, -0.25/2])
-        time_text.set_text('')
-        return line, time_text
-
-    def animate(i):
-        line.set_data([u_hs[i], x_hs[i]],[0, h])
-        circle.set_data([ox + x_hs[i]],[ oy + h])
-        rectangle.set_xy([u_hs[i]-0.25/2, -0.25/2])
-        time_text.set_text('time = {0:.2f}'.format(i*t))
-        return line, time_text
-
-    ani = animation.FuncAnimation(fig, animate, frames=range(len(x_hs)),
-                                  interval=t*1000, blit=False, init_func=init)
+    # pendulum geometry of every frame
+    x_hs = np.asarray(x_hs)
+    u_hs = np.asarray(u_hs)
+    ground = np.zeros_like(x_hs)
+    top = np.full_like(x_hs, h)
+    play = Playback(ax, np.arange(len(x_hs)) * t)
+    play.line(np.stack((np.stack((u_hs, ground), axis=1), np.stack((x_hs, top), axis=1)), axis=1), '-r', lw=2)
+    play.circles(np.stack((x_hs, top), axis=1)[:, np.newaxis, :], 0.1, '-r', lw=2)
+    play.rectangle(np.stack((u_hs-0.25/2, ground-0.25/2), axis=1), 0.25, 0.25, ec='r', fill=False, lw=2)
+    play.text(0.02, 0.95)
+
+    ani = play.animation(fig, decimate)
     plt.show()
-    #ani.save("output.gif", writer="imagemagick")
+    #play.save(fig, "output.gif", decimate)
+    return ani
 
 if __name__ == '__main__':
     x_ref = np.array([[0.5],[0.]])
@@ -87,12 +114,12 @@ if __name__ == '__main__':
     time_step = (int) (period / dt)
     plant = LinearInvertedPendulum(height)
     plant.init_state(x_start, x_ref, u_ref, dt)
-    X_history = np.array(plant.get_X())
-    u_history = np.array(plant.get_u())
-    for i in range(time_step-1):
-        plant.do_action(x_ref, u_ref)
-        u_history = np.append(u_history, plant.get_u(), axis=1)
-        X_history = np.append(X_history, plant.get_X(), axis=1)
+    def regulator(k, X):
+        plant.X = X
+        return plant.bestCOG_Regulator(x_ref, u_ref)
+    X_history, u_history = plant.system.simulate(plant.get_X(), regulator, time_step)
+    X_history = X_history[:, :, 0].T
+    u_history = u_history[:, :, 0].T
 
     t = np.linspace(0, time_step*dt, time_step)
 
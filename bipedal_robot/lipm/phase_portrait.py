@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+import numpy as np
+from scipy.integrate import odeint
+from scipy.linalg import expm
+
+# dX = A X for a grid of states X (n, ...), e.g. np.array(np.meshgrid(...))
+def vector_field(A, X):
+    return np.einsum('ij,j...->i...', A, X)
+
+def normalize(dX, eps = 1e-6):
+    return dX / (np.sqrt(np.sum(dX**2, axis=0)) + eps)
+
+# integrate all seeds X0 (N, n) together with one odeint call
+# f(X, t) -> dX takes and returns a batch of states (N, n)
+# return trajectories (N, T, n)
+def integrate(f, X0, t):
+    X0 = np.asarray(X0, dtype=np.float64)
+    N, n = X0.shape
+    flat = lambda y, t_: f(y.reshape(N, n), t_).ravel()
+    return odeint(flat, X0.ravel(), t).reshape(t.size, N, n).transpose(1, 0, 2)
+
+# dynamics function of a linear system for integrate()
+def linear(A):
+    return lambda X, t: X @ A.T
+
+class LTIFlow(object):
+    # exact flow expm(A t) X0 of dX = A X from the cached eigendecomposition of A
+    def __init__(self, A):
+        self.A = np.asarray(A, dtype=np.float64)
+        self.lam, self.V = np.linalg.eig(self.A)
+        self.diagonalizable = np.linalg.cond(self.V) < 1e8
+        if self.diagonalizable:
+            self.V_inv = np.linalg.inv(self.V)
+
+    # X0 (N, n), t (T,) -> trajectories (N, T, n)
+    def evaluate(self, X0, t):
+        X0 = np.asarray(X0, dtype=np.float64)
+        t = np.asarray(t, dtype=np.float64)
+        if not self.diagonalizable:
+            Phi = np.array([expm(self.A * ti) for ti in t])
+            return np.einsum('tij,nj->nti', Phi, X0)
+        Z = X0 @ self.V_inv.T # modal coordinates
+        E = np.exp(np.outer(t, self.lam))
+        # (N*T, n) modal trajectories mapped back in one matrix product
+        X = (Z[:, np.newaxis, :] * E[np.newaxis]).reshape(-1, self.lam.size) @ self.V.T
+        return X.real.reshape(X0.shape[0], t.size, -1)
+
+# trajectories (N, T, n) of seeds X0 (N, n),
+# closed form for a state matrix, odeint for a nonlinear f(X, t)
+def flow(dynamics, X0, t):
+    if isinstance(dynamics, LTIFlow):
+        return dynamics.evaluate(X0, t)
+    if isinstance(dynamics, np.ndarray):
+        return LTIFlow(dynamics).evaluate(X0, t)
+    return integrate(dynamics, X0, t)
+
+# mask (N, T-1) of samples s where the segment s..s+1 touches the box boundary
+def boundary_crossings(X, lower, upper):
+    lower = np.asarray(lower, dtype=np.float64)
+    upper = np.asarray(upper, dtype=np.float64)
+    lo = X - lower
+    up = X - upper
+    cross = (lo[:, :-1] * lo[:, 1:] <= 0) | (up[:, :-1] * up[:, 1:] <= 0)
+    return np.any(cross, axis=-1)
+
+# sample index of the first `count` True entries of each row, -1 where missing
+def first_crossings(mask, count = 2):
+    N = mask.shape[0]
+    index = np.full((N, count), -1)
+    rank = np.cumsum(mask, axis=1) # k-th crossing has rank k+1
+    for k in range(count):
+        hit = mask & (rank == k + 1)
+        found = np.any(hit, axis=1)
+        index[found, k] = np.argmax(hit[found], axis=1)
+    return index
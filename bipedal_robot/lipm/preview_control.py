@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+from functools import lru_cache
+import numpy as np
+import matplotlib.pyplot as plt
+from scipy.linalg import solve_discrete_are
+
+gravity = 9.8 # gravity
+
+# cart-table model, state [x, x_dot, x_ddot], input jerk, output ZMP
+def cart_table(height, dt):
+    A = np.array([[1, dt, dt**2/2], [0, 1, dt], [0, 0, 1]])
+    B = np.array([[dt**3/6], [dt**2/2], [dt]])
+    C = np.array([[1, 0, -height/gravity]])
+    return A, B, C
+
+# Riccati solution and preview gains of the augmented (integral of ZMP error) system,
+# cached per parameter set
+@lru_cache(maxsize=32)
+def preview_gain(height, dt, horizon, Qe = 1.0, R = 1e-6):
+    A, B, C = cart_table(height, dt)
+    # augmented state [ZMP error sum, x-increment]
+    A_ = np.block([[np.ones((1, 1)), C @ A], [np.zeros((3, 1)), A]])
+    B_ = np.vstack((C @ B, B))
+    Q = np.zeros((4, 4))
+    Q[0, 0] = Qe
+    P = solve_discrete_are(A_, B_, Q, np.array([[R]]))
+    S = np.asarray(R + B_.T @ P @ B_).item()
+    K = (B_.T @ P @ A_) / S
+    Gi = K[0, 0] # integral gain
+    Gx = K[0, 1:] # state feedback gain
+    # preview gain for each future reference
+    Ac = A_ - B_ @ K
+    I_ = np.zeros((4, 1))
+    I_[0, 0] = 1
+    X = -Ac.T @ P @ I_
+    Gd = np.empty(horizon)
+    Gd[0] = -Gi
+    for i in range(1, horizon):
+        Gd[i] = (B_.T @ X).item() / S
+        X = Ac.T @ X
+    Gi, Gx, Gd = float(Gi), Gx.copy(), Gd
+    Gx.flags.writeable = False
+    Gd.flags.writeable = False
+    return Gi, Gx, Gd
+
+class PreviewController(object):
+    # Kajita's preview control tracking a ZMP reference
+    # horizon : number of future references used per step
+    def __init__(self, height, dt, horizon, x = 0., Qe = 1.0, R = 1e-6):
+        self.height = height
+        self.dT = dt
+        self.horizon = horizon
+        self.A, self.B, self.C = cart_table(height, dt)
+        self.Gi, self.Gx, self.Gd = preview_gain(height, dt, horizon, Qe, R)
+        self.X = np.array([x, 0., 0.])
+        self.error_sum = 0.
+        self.current = x # reference of the current step
+        # ring buffer of the next `horizon` references, head is the next one
+        self.reference = np.full(horizon, x)
+        self.head = 0
+        self.filled = 0
+
+    # append the reference following the last pushed one
+    def push(self, zmp_ref):
+        self.reference[(self.head + self.filled) % self.horizon] = zmp_ref
+        self.filled = min(self.filled + 1, self.horizon)
+
+    def preview(self):
+        h = self.head
+        return np.dot(self.Gd[:self.horizon - h], self.reference[h:]) + np.dot(self.Gd[self.horizon - h:], self.reference[:h])
+
+    # one control step, expects `horizon` references pushed ahead
+    def step(self):
+        zmp = self.C[0] @ self.X
+        self.error_sum += zmp - self.current
+        u = -self.Gi * self.error_sum - self.Gx @ self.X - self.preview()
+        self.X = self.A @ self.X + self.B[:, 0] * u
+        self.current = self.reference[self.head]
+        self.head = (self.head + 1) % self.horizon
+        self.filled -= 1
+        return self.X, zmp
+
+    # track a whole reference sequence, padded with its last value for the preview
+    def track(self, zmp_ref):
+        zmp_ref = np.asarray(zmp_ref, dtype=np.float64)
+        X = np.empty((zmp_ref.size, 3))
+        zmp = np.empty(zmp_ref.size)
+        ahead = np.concatenate((zmp_ref, np.full(self.horizon + 1, zmp_ref[-1])))
+        self.current = ahead[0]
+        self.filled = 0
+        for i in range(self.horizon):
+            self.push(ahead[i + 1])
+        for k in range(zmp_ref.size):
+            X[k], zmp[k] = self.step()
+            self.push(ahead[k + self.horizon + 1])
+        return X, zmp
+
+if __name__ == '__main__':
+    dt = 0.01
+    height = 0.8
+    preview_time = 1.6
+    controller = PreviewController(height, dt, int(preview_time / dt))
+
+    footstep = [0.0, 0.2, 0.4, 0.6, 0.8, 0.8]
+    duration = [1.6, 0.6, 0.6, 0.6, 0.6, 1.5]
+    zmp_ref = np.concatenate([np.full(int(round(T / dt)), p) for p, T in zip(footstep, duration)])
+    X, zmp = controller.track(zmp_ref)
+
+    t = np.arange(zmp_ref.size) * dt
+    plt.plot(t, zmp_ref, label="ZMP reference")
+    plt.plot(t, zmp, label="ZMP")
+    plt.plot(t, X[:, 0], label="COG position")
+    plt.legend()
+    plt.show()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+from functools import lru_cache
+import numpy as np
+import matplotlib.pyplot as plt
+
+gravity = 9.8 # gravity
+
+# N-step capturability bound on the capture point x + x_dot/omega,
+# relative to the stance foot (Koolen et al.)
+# d_0 = foot_half, d_N = (d_{N-1} - foot_half + step_limit) exp(-omega step_time) + foot_half
+def capture_bound(height, step_limit, foot_half = 0., step_time = 0.3, n_step = np.inf):
+    omega = np.sqrt(gravity / height)
+    decay = np.exp(-omega * step_time)
+    if np.isinf(n_step):
+        # limit of the recursion
+        return foot_half + step_limit * decay / (1 - decay)
+    d = foot_half
+    for i in range(int(n_step)):
+        d = (d - foot_half + step_limit) * decay + foot_half
+    return d
+
+# capture region as half-spaces H [x, x_dot]^T <= h
+# the state box |x| <= x_max, |x_dot| <= v_max is added when given
+@lru_cache(maxsize=64)
+def capture_region(height, step_limit, foot_half = 0., step_time = 0.3, n_step = np.inf, x_max = None, v_max = None):
+    omega = np.sqrt(gravity / height)
+    d = capture_bound(height, step_limit, foot_half, step_time, n_step)
+    H = [[1., 1./omega], [-1., -1./omega]]
+    h = [d, d]
+    if x_max is not None:
+        H += [[1., 0.], [-1., 0.]]
+        h += [x_max, x_max]
+    if v_max is not None:
+        H += [[0., 1.], [0., -1.]]
+        h += [v_max, v_max]
+    H = np.array(H)
+    h = np.array(h)
+    H.flags.writeable = False
+    h.flags.writeable = False
+    return H, h
+
+# X : (N, 2) states [x, x_dot] relative to the stance foot -> (N,) recoverable
+def classify(H, h, X, tolerance = 1e-6):
+    return np.all(X @ H.T - h <= tolerance, axis=1)
+
+class BalanceMonitor(object):
+    def __init__(self, height, step_limit, foot_half = 0., step_time = 0.3, n_step = np.inf, x_max = None, v_max = None):
+        self.H, self.h = capture_region(height, step_limit, foot_half, step_time, n_step, x_max, v_max)
+
+    def recoverable(self, X, tolerance = 1e-6):
+        return classify(self.H, self.h, np.atleast_2d(X), tolerance)
+
+    # signed margin to the nearest half-space, negative outside
+    def margin(self, X):
+        X = np.atleast_2d(X)
+        return np.min((self.h - X @ self.H.T) / np.linalg.norm(self.H, axis=1), axis=1)
+
+if __name__ == '__main__':
+    height = 0.8
+    limit = 1.0
+    X1, X2 = np.meshgrid(np.linspace(-limit, limit, 400), np.linspace(-2*limit, 2*limit, 400))
+    X = np.stack((X1.ravel(), X2.ravel()), axis=1)
+
+    fig = plt.figure(figsize=(6,6))
+    ax = fig.add_subplot(111)
+    for n_step, color in ((np.inf, 'Blues'), (1, 'Greens'), (0, 'Reds')):
+        monitor = BalanceMonitor(height, 0.4, 0.1, 0.3, n_step)
+        inside = monitor.recoverable(X).reshape(X1.shape)
+        ax.contourf(X1, X2, inside, levels=[0.5, 1], cmap=color, alpha=0.4)
+    ax.set_title("LIPM capture regions (0, 1, inf steps)")
+    ax.set_xlabel('position $x$')
+    ax.set_ylabel('velocity $\\dot{x}$')
+    plt.grid()
+    plt.show()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+import numpy as np
+import matplotlib.pyplot as plt
+
+from lipm_simulate import LinearInvertedPendulum
+
+class WalkingPatternGenerator(object):
+    # X0 : initial COG state [[x], [x_dot]]
+    # footstep, duration : ZMP position and support time of each step
+    def __init__(self, plant, X0, footstep, duration, dt = 0.01):
+        self.plant = plant
+        self.X0 = np.array(X0, dtype=np.float64).reshape(2, 1)
+        self.footstep = [float(p) for p in footstep]
+        self.duration = [float(T) for T in duration]
+        self.dT = dt
+
+        self.boundary = [] # COG state at the start of each step
+        self.X_segment = [] # sampled COG trajectory of each step
+        self.valid = 0 # steps [0, valid) are up to date
+        self.recomputed = 0 # steps recomputed by the last update
+
+    def step_count(self):
+        return len(self.footstep)
+
+    def append(self, footstep, duration):
+        self.footstep.append(float(footstep))
+        self.duration.append(float(duration))
+
+    # later steps start from this one's end state, so they are recomputed too
+    # negative indices count from the end as for a list
+    def modify(self, i, footstep = None, duration = None):
+        i = range(self.step_count())[i]
+        if footstep is not None:
+            self.footstep[i] = float(footstep)
+        if duration is not None:
+            self.duration[i] = float(duration)
+        self.valid = min(self.valid, i)
+
+    # keep the first n steps, n < 0 drops the last -n as for a slice
+    def truncate(self, n):
+        n = range(self.step_count())[n] if n < 0 else range(self.step_count() + 1)[n]
+        del self.footstep[n:]
+        del self.duration[n:]
+        self.valid = min(self.valid, n)
+
+    def update(self):
+        del self.boundary[self.valid:]
+        del self.X_segment[self.valid:]
+        if self.valid == 0:
+            x, x_dot = self.X0[0][0], self.X0[1][0]
+        else:
+            s = self.valid - 1
+            x, x_dot = self.plant.analytic_state(self.boundary[s][0], self.boundary[s][1], self.footstep[s], self.duration[s])
+        for s in range(self.valid, self.step_count()):
+            self.boundary.append((x, x_dot))
+            tau = np.arange(int(round(self.duration[s] / self.dT))) * self.dT
+            self.X_segment.append(np.array(self.plant.analytic_state(x, x_dot, self.footstep[s], tau)))
+            # analytic solution at the step boundary
+            x, x_dot = self.plant.analytic_state(x, x_dot, self.footstep[s], self.duration[s])
+        self.recomputed = self.step_count() - self.valid
+        self.valid = self.step_count()
+
+    # return sample times, COG trajectory (2, T) and ZMP reference (T,)
+    def trajectory(self):
+        self.update()
+        X = np.concatenate(self.X_segment, axis=1)
+        zmp = np.concatenate([np.full(seg.shape[1], p) for seg, p in zip(self.X_segment, self.footstep)])
+        return np.arange(X.shape[1]) * self.dT, X, zmp
+
+    def final_state(self):
+        self.update()
+        s = self.step_count() - 1
+        return np.array(self.plant.analytic_state(self.boundary[s][0], self.boundary[s][1], self.footstep[s], self.duration[s]))
+
+# initial COG velocity that brings the COG to rest over the last footstep,
+# from the backward recursion of the divergent component x + x_dot/omega
+def balanced_velocity(plant, x0, footstep, duration):
+    xi = footstep[-1]
+    for p, T in zip(reversed(footstep), reversed(duration)):
+        xi = p + (xi - p) * np.exp(-plant.omega * T)
+    return plant.omega * (xi - x0)
+
+if __name__ == '__main__':
+    height = 0.8
+    plant = LinearInvertedPendulum(height)
+    footstep = [0.0, 0.2, 0.4, 0.6, 0.8, 0.8]
+    duration = [0.6, 0.6, 0.6, 0.6, 0.6, 1.0]
+    x_dot = balanced_velocity(plant, 0., footstep, duration)
+    pattern = WalkingPatternGenerator(plant, [[0.], [x_dot]], footstep, duration)
+    t, X, zmp = pattern.trajectory()
+
+    plt.plot(t, X[0], label="COG position")
+    plt.plot(t, X[1], label="COG velocity")
+    plt.plot(t, zmp, label="ZMP reference")
+
+    # replan a future step, earlier steps keep their cached trajectory
+    pattern.modify(4, footstep=0.85)
+    t, X, zmp = pattern.trajectory()
+    print('recomputed {0} of {1} steps'.format(pattern.recomputed, pattern.step_count()))
+    plt.plot(t, X[0], '--', label="COG position (replanned)")
+    plt.legend()
+    plt.show()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import numpy as np
+import matplotlib.pyplot as plt
+
+from spring_mass_damper import SpringMassDamper
+
+class PIDBank(object):
+    # N PID loops on states X (2, N) = [position, velocity], stepped together
+    # u = u_ref + kp e + ki int(e) + kd e_dot with e = x_ref - x, clipped to [u_min, u_max]
+    # anti-windup : back-calculation with gain kaw where kaw > 0, conditional integration where kaw == 0
+    def __init__(self, kp, ki, kd, dt, u_min = -np.inf, u_max = np.inf, kaw = 0.):
+        kp, ki, kd, u_min, u_max, kaw = np.broadcast_arrays(*[np.atleast_1d(np.asarray(v, dtype=np.float64))
+                                                              for v in (kp, ki, kd, u_min, u_max, kaw)])
+        N = kp.size
+        self.dT = dt
+        # gain rows [kp, ki, kd] match state rows [e, int(e), e_dot]
+        self.gain = np.empty((3, N))
+        self.gain[0] = kp
+        self.gain[1] = ki
+        self.gain[2] = kd
+        self.state = np.zeros((3, N))
+        self.error = self.state[0]
+        self.integral = self.state[1]
+        self.error_dot = self.state[2]
+        self.u_min = u_min.copy()
+        self.u_max = u_max.copy()
+        self.kaw = kaw.copy()
+        self.clamp = self.kaw == 0
+        self.u_raw = np.zeros(N)
+        self.u = np.zeros((1, N))
+        self.saturated = np.zeros(N, dtype=bool)
+
+    def size(self):
+        return self.gain.shape[1]
+
+    def kp(self):
+        return self.gain[0]
+
+    def ki(self):
+        return self.gain[1]
+
+    def kd(self):
+        return self.gain[2]
+
+    # clear the integrators of all loops, or of the selected ones
+    def reset(self, index = slice(None)):
+        self.state[:, index] = 0
+        self.u[:, index] = 0
+        self.saturated[index] = False
+
+    # bank of the selected loops, keeping their integrator state
+    def take(self, index):
+        bank = PIDBank(self.gain[0, index], self.gain[1, index], self.gain[2, index], self.dT,
+                       self.u_min[index], self.u_max[index], self.kaw[index])
+        bank.state[:] = self.state[:, index]
+        bank.u[:] = self.u[:, index]
+        bank.saturated[:] = self.saturated[index]
+        return bank
+
+    # X, x_ref : (2, N) or broadcastable, u_ref : (1, N) or broadcastable -> u (1, N)
+    def controller(self, X, x_ref, u_ref = 0.):
+        np.subtract(x_ref, X, out=self.state[0::2])
+        np.einsum('ij,ij->j', self.gain, self.state, out=self.u_raw)
+        self.u_raw += np.reshape(u_ref, -1)
+        np.clip(self.u_raw, self.u_min, self.u_max, out=self.u[0])
+        np.not_equal(self.u[0], self.u_raw, out=self.saturated)
+        # the integrator runs only while it does not push further into saturation,
+        # or is bled off by the saturation excess
+        winding = self.saturated & self.clamp & (self.error * (self.u_raw - self.u[0]) > 0)
+        self.integral += self.dT * (np.where(winding, 0., self.error) + self.kaw * (self.u[0] - self.u_raw))
+        return self.u
+
+    # controller(k, X) callback for LinearSystem.simulate with fixed references
+    def callback(self, x_ref, u_ref = 0.):
+        return lambda k, X: self.controller(X, x_ref, u_ref)
+
+if __name__ == '__main__':
+    dt = 0.01
+    period = 20
+    time_step = (int) (period / dt)
+    kp = np.linspace(20, 200, 10)
+    # loops 0-9 unsaturated, 10-19 saturated with conditional integration, 20-29 with back-calculation
+    limit = np.repeat([np.inf, 100., 100.], 10)
+    bank = PIDBank(np.tile(kp, 3), 20, 25, dt, u_min=-limit, u_max=limit, kaw=np.repeat([0., 0., 1.], 10))
+    plant = SpringMassDamper(0., 0., dt=dt)
+    x_ref = np.array([[1.0], [0.0]])
+    X0 = np.zeros((2, bank.size()))
+    X_history, u_history = plant.system.simulate(X0, bank.callback(x_ref), time_step)
+
+    t = np.linspace(0, time_step*dt, time_step)
+    fig = plt.figure()
+    ax1 = fig.add_subplot(211, ylabel='position')
+    ax2 = fig.add_subplot(212, ylabel='control', xlabel='t')
+    for i, style in zip((9, 19, 29), ('-', '--', ':')):
+        ax1.plot(t, X_history[:, 0, i], style, label='loop {0}'.format(i))
+        ax2.plot(t, u_history[:, 0, i], style, label='loop {0}'.format(i))
+    ax1.legend()
+    plt.show()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+
+from spring_mass_damper import SpringMassDamper
+
+# G(jw) = C (jw I - A)^-1 B of a single-input plant for every frequency in one batched solve
+# A (..., n, n), B (..., n, 1), output row C (n,) -> (..., W)
+def frequency_response(A, B, omega, C = (1., 0.)):
+    A = np.asarray(A, dtype=np.float64)
+    n = A.shape[-1]
+    s = 1j * np.asarray(omega, dtype=np.float64)
+    M = s[:, np.newaxis, np.newaxis] * np.identity(n) - A[..., np.newaxis, :, :]
+    B = np.broadcast_to(np.asarray(B, dtype=np.float64)[..., np.newaxis, :, :], M.shape[:-1] + (1,))
+    return np.linalg.solve(M, B)[..., 0] @ np.asarray(C, dtype=np.complex128)
+
+# C(jw) = kp + ki/jw + kd jw, gains (N,) -> (N, W)
+def pid_response(kp, ki, kd, omega):
+    s = 1j * np.asarray(omega, dtype=np.float64)
+    kp, ki, kd = [np.asarray(g, dtype=np.float64)[..., np.newaxis] for g in (kp, ki, kd)]
+    return kp + ki / s + kd * s
+
+def open_loop(plant, kp, ki, kd, omega):
+    return pid_response(kp, ki, kd, omega) * frequency_response(plant.A, plant.B, omega)
+
+# first crossing of y (..., W) through `level` along the last axis
+# return index of the sample before it (-1 if none) and the interpolation fraction
+def first_crossing(y, level):
+    d = y - level
+    cross = (d[..., :-1] > 0) != (d[..., 1:] > 0)
+    found = np.any(cross, axis=-1)
+    i = np.argmax(cross, axis=-1)
+    d0 = np.take_along_axis(d, i[..., np.newaxis], axis=-1)[..., 0]
+    d1 = np.take_along_axis(d, i[..., np.newaxis] + 1, axis=-1)[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(found, d0 / (d0 - d1), 0.)
+    return np.where(found, i, -1), fraction
+
+# first crossing of y (..., W) through any of level + period k, e.g. a phase through -180 + 360 k
+def first_periodic_crossing(y, level, period):
+    band = np.floor((y - level) / period)
+    cross = band[..., :-1] != band[..., 1:]
+    found = np.any(cross, axis=-1)
+    i = np.argmax(cross, axis=-1)[..., np.newaxis]
+    y0 = np.take_along_axis(y, i, axis=-1)[..., 0]
+    y1 = np.take_along_axis(y, i + 1, axis=-1)[..., 0]
+    # the level passed between the two samples
+    crossed = level + period * np.maximum(np.take_along_axis(band, i, axis=-1)[..., 0],
+                                          np.take_along_axis(band, i + 1, axis=-1)[..., 0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(found, (y0 - crossed) / (y0 - y1), 0.)
+    return np.where(found, i[..., 0], -1), fraction
+
+# value of x (W,) or (..., W) at the crossing, interpolated in log frequency
+def at_crossing(x, index, fraction):
+    x = np.broadcast_to(x, index.shape + (np.shape(x)[-1],))
+    i = np.maximum(index, 0)[..., np.newaxis]
+    x0 = np.take_along_axis(x, i, axis=-1)[..., 0]
+    x1 = np.take_along_axis(x, np.minimum(i + 1, x.shape[-1] - 1), axis=-1)[..., 0]
+    return np.where(index >= 0, x0 + (x1 - x0) * fraction, np.nan)
+
+# gain margin [dB], phase margin [deg], crossover frequencies and closed-loop bandwidth of L (..., W)
+# margins are taken at the first crossing, inf when the crossing is outside the grid
+def margins(omega, L):
+    log_omega = np.log(omega)
+    magnitude = 20 * np.log10(np.abs(L))
+    phase = np.degrees(np.unwrap(np.angle(L), axis=-1))
+    result = {}
+
+    i, f = first_crossing(magnitude, 0.)
+    result['gain_crossover'] = np.exp(at_crossing(log_omega, i, f))
+    result['phase_margin'] = np.where(i >= 0, 180. + at_crossing(phase, i, f), np.inf)
+
+    # phase crossover where the unwrapped phase passes -180 + 360 k
+    i, f = first_periodic_crossing(phase, -180., 360.)
+    result['phase_crossover'] = np.exp(at_crossing(log_omega, i, f))
+    result['gain_margin'] = np.where(i >= 0, -at_crossing(magnitude, i, f), np.inf)
+
+    # -3 dB of the complementary sensitivity L / (1 + L) relative to its low frequency value
+    T = 20 * np.log10(np.abs(L / (1 + L)))
+    i, f = first_crossing(T, T[..., :1] - 3.)
+    result['bandwidth'] = np.exp(at_crossing(log_omega, i, f))
+    return result
+
+# eigenvalues of the loop with the integrator state, gains (N,) -> (N,) stable
+def closed_loop_stable(plant, kp, ki, kd):
+    kp, ki, kd = np.broadcast_arrays(*[np.atleast_1d(np.asarray(g, dtype=np.float64)) for g in (kp, ki, kd)])
+    A = np.asarray(plant.A, dtype=np.float64)
+    B = np.asarray(plant.B, dtype=np.float64)
+    N = kp.shape[0]
+    # states [x, x_dot, int(e)] with e = x_ref - x, u = kp e + ki int(e) - kd x_dot
+    A_cl = np.zeros((N, 3, 3))
+    A_cl[:, :2, :2] = A - B[np.newaxis] * np.stack((kp, kd), axis=1)[:, np.newaxis, :]
+    A_cl[:, :2, 2] = B[:, 0] * ki[:, np.newaxis]
+    A_cl[:, 2, 0] = -1
+    return np.all(np.linalg.eigvals(A_cl).real < 0, axis=1)
+
+# margins and stability of every gain set [kp, ki, kd] (N, 3)
+def analyze(plant, gains, omega = None):
+    gains = np.atleast_2d(gains)
+    if omega is None:
+        omega = np.logspace(-3, 4, 400)
+    L = open_loop(plant, gains[:, 0], gains[:, 1], gains[:, 2], omega)
+    result = margins(omega, L)
+    result['stable'] = closed_loop_stable(plant, gains[:, 0], gains[:, 1], gains[:, 2])
+    return result
+
+if __name__ == '__main__':
+    plant = SpringMassDamper(0.)
+    omega = np.logspace(-3, 4, 400)
+    kp, ki, kd = 50, 20, 25
+    L = open_loop(plant, kp, ki, kd, omega)
+    result = analyze(plant, [kp, ki, kd], omega)
+    print('gain margin {0[gain_margin][0]:.2f} dB, phase margin {0[phase_margin][0]:.2f} deg, '
+          'crossover {0[gain_crossover][0]:.3f} rad/s, bandwidth {0[bandwidth][0]:.3f} rad/s, stable {0[stable][0]}'.format(result))
+
+    # pure integral control, L(j1) = -ki / 25 at the phase crossover w = 1 rad/s
+    for ki_ in (10., 40.):
+        check = analyze(plant, [0., ki_, 0.], omega)
+        assert abs(check['phase_crossover'][0] - 1.) < 1e-2
+        assert abs(check['gain_margin'][0] + 20 * np.log10(ki_ / 25.)) < 1e-2
+        assert check['stable'][0] == (check['gain_margin'][0] > 0)
+
+    # screening many candidates at once
+    gains = np.exp(np.random.default_rng(0).uniform(0, np.log(1000), (10000, 3)))
+    start = time.perf_counter()
+    screened = analyze(plant, gains, omega)
+    print('{0} candidates in {1:.3f} sec, {2} stable with phase margin > 45 deg'.format(
+        gains.shape[0], time.perf_counter() - start, np.sum(screened['stable'] & (screened['phase_margin'] > 45))))
+
+    fig = plt.figure()
+    ax1 = fig.add_subplot(211, ylabel='gain [dB]', xscale='log')
+    ax1.plot(omega, 20 * np.log10(np.abs(L)))
+    ax1.axhline(0, color='k', lw=0.5)
+    ax2 = fig.add_subplot(212, ylabel='phase [deg]', xlabel='frequency [rad/s]', xscale='log')
+    ax2.plot(omega, np.degrees(np.unwrap(np.angle(L))))
+    ax2.axhline(-180, color='k', lw=0.5)
+    plt.show()
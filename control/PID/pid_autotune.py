@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from spring_mass_damper import SpringMassDamper
+from controller_bank import PIDBank
+
+# candidate status
+RUNNING = 0 # neither settled nor diverged within the period
+SETTLED = 1
+DIVERGED = 2
+
+metrics = ('ise', 'itae', 'overshoot', 'settling', 'stopped', 'status')
+
+# (N, 3) candidates [kp, ki, kd] on a full grid
+def grid_gains(kp, ki, kd):
+    return np.stack(np.meshgrid(kp, ki, kd, indexing='ij'), axis=-1).reshape(-1, 3)
+
+# (N, 3) candidates sampled log-uniformly in bounds [[kp_min, kp_max], [ki_min, ki_max], [kd_min, kd_max]]
+def random_gains(bounds, n, seed = 0):
+    bounds = np.log(np.asarray(bounds, dtype=np.float64))
+    return np.exp(np.random.default_rng(seed).uniform(bounds[:, 0], bounds[:, 1], (n, 3)))
+
+# step response of every candidate from rest to position x_ref, all loops stepped together
+# a candidate stops once it stays within `band` of x_ref for `hold` seconds (settled),
+# or its error exceeds `diverge` times the step (diverged); checks are made every `block` steps
+# return a dict of (N,) metric arrays, see `metrics`
+def evaluate(gains, dt = 0.01, period = 60., x_ref = 1.0, band = 0.02, hold = 2.0, diverge = 1e2,
+             u_limit = np.inf, block = 100):
+    gains = np.atleast_2d(gains)
+    N = gains.shape[0]
+    steps = int(period / dt)
+    plant = SpringMassDamper(0., dt=dt)
+    Ad, Bd = plant.system.Ad, plant.system.Bd
+    bank = PIDBank(gains[:, 0], gains[:, 1], gains[:, 2], dt, -u_limit, u_limit)
+    reference = np.array([[x_ref], [0.]])
+    tolerance = band * abs(x_ref)
+
+    result = {name: np.zeros(N) for name in metrics}
+    peak = np.zeros(N)
+    last_out = np.zeros(N) # last sample time outside the band
+    active = np.arange(N)
+    X = np.zeros((2, N))
+    e = np.empty((block, N))
+    for start in range(0, steps, block):
+        n = min(block, steps - start)
+        count = active.size
+        for k in range(n):
+            u = bank.controller(X, reference)
+            X = Ad @ X + Bd @ u
+            e[k, :count] = x_ref - X[0]
+        # metrics of this block from the error trajectory
+        t = (start + 1 + np.arange(n)) * dt
+        err = e[:n, :count]
+        result['ise'][active] += np.sum(err**2, axis=0) * dt
+        result['itae'][active] += t @ np.abs(err) * dt
+        peak[active] = np.maximum(peak[active], np.max((x_ref - err) * np.sign(x_ref), axis=0))
+        outside = np.abs(err) > tolerance
+        hit = np.any(outside, axis=0)
+        last_out[active[hit]] = t[n - 1 - np.argmax(outside[::-1, hit], axis=0)]
+        # early termination
+        diverged = ~np.all(np.isfinite(err), axis=0) | np.any(np.abs(err) > diverge * abs(x_ref), axis=0)
+        settled = ~diverged & (t[-1] - last_out[active] >= hold)
+        result['status'][active[settled]] = SETTLED
+        result['status'][active[diverged]] = DIVERGED
+        result['stopped'][active] = t[-1]
+        done = settled | diverged
+        if np.any(done):
+            keep = np.flatnonzero(~done)
+            active = active[keep]
+            bank = bank.take(keep)
+            X = X[:, keep]
+        if active.size == 0:
+            break
+
+    result['overshoot'] = np.maximum(peak - abs(x_ref), 0) / abs(x_ref)
+    result['settling'] = np.where(result['status'] == SETTLED, last_out, np.inf)
+    for name in ('ise', 'itae', 'overshoot'):
+        result[name][result['status'] == DIVERGED] = np.inf
+    return result
+
+def evaluate_chunk(args):
+    gains, kwargs = args
+    return evaluate(gains, **kwargs)
+
+# evaluate candidates in chunks over `processes` workers, return the metrics of all of them in order
+def autotune(gains, processes = None, chunk = 256, **kwargs):
+    chunks = [(gains[i:i + chunk], kwargs) for i in range(0, gains.shape[0], chunk)]
+    if processes == 1:
+        results = [evaluate_chunk(c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(evaluate_chunk, chunks))
+    return {name: np.concatenate([r[name] for r in results]) for name in metrics}
+
+# candidates ordered by cost, those over the overshoot limit or unsettled last
+def rank(result, cost = 'itae', max_overshoot = np.inf):
+    penalty = (result['overshoot'] > max_overshoot) | (result['status'] != SETTLED)
+    return np.lexsort((result[cost], penalty))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='PID gain auto-tuning on the spring mass damper')
+    parser.add_argument('--kp', type=float, nargs=3, default=[1, 1000, 20], metavar=('MIN', 'MAX', 'N'))
+    parser.add_argument('--ki', type=float, nargs=3, default=[1, 1000, 20], metavar=('MIN', 'MAX', 'N'))
+    parser.add_argument('--kd', type=float, nargs=3, default=[1, 1000, 20], metavar=('MIN', 'MAX', 'N'))
+    parser.add_argument('--random', type=int, default=0, help='sample this many candidates instead of the grid')
+    parser.add_argument('--cost', default='itae', choices=['ise', 'itae', 'settling'])
+    parser.add_argument('--max-overshoot', type=float, default=0.1)
+    parser.add_argument('--period', type=float, default=60.)
+    parser.add_argument('--dt', type=float, default=0.01)
+    parser.add_argument('--u-limit', type=float, default=np.inf)
+    parser.add_argument('-p', '--processes', type=int, default=os.cpu_count())
+    parser.add_argument('-n', '--top', type=int, default=10)
+    args = parser.parse_args()
+
+    axis = [np.geomspace(a[0], a[1], int(a[2])) for a in (args.kp, args.ki, args.kd)]
+    if args.random > 0:
+        gains = random_gains([(a[0], a[1]) for a in (args.kp, args.ki, args.kd)], args.random)
+    else:
+        gains = grid_gains(*axis)
+
+    start = time.perf_counter()
+    result = autotune(gains, args.processes, dt=args.dt, period=args.period, u_limit=args.u_limit)
+    elapsed = time.perf_counter() - start
+    status = result['status']
+    print('{0} candidates in {1:.2f} sec, settled {2}, diverged {3}, mean simulated {4:.1f} sec'.format(
+        gains.shape[0], elapsed, np.sum(status == SETTLED), np.sum(status == DIVERGED), np.mean(result['stopped'])))
+    print('{0:>10} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10} {6:>10}'.format('kp', 'ki', 'kd', 'ise', 'itae', 'overshoot', 'settling'))
+    for i in rank(result, args.cost, args.max_overshoot)[:args.top]:
+        print('{0:10.3f} {1:10.3f} {2:10.3f} {3:10.4f} {4:10.4f} {5:10.4f} {6:10.3f}'.format(
+            *gains[i], result['ise'][i], result['itae'][i], result['overshoot'][i], result['settling'][i]))
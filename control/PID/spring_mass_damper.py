@@ -1,33 +1,87 @@
 #!/usr/bin/env python3
+import os
+import sys
+from functools import lru_cache
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'simulation'))
+from lti import LinearSystem, LinearSystemFamily
+
+# discrete system of one plant, shared by every instance with the same parameters and dt
+@lru_cache(maxsize=128)
+def plant_system(mass, elasticity, viscosity, dt, method):
+    A, B = SpringMassDamper.matrices(mass, elasticity, viscosity)
+    system = LinearSystem(A, B, dt, method)
+    system.Ad.flags.writeable = False
+    system.Bd.flags.writeable = False
+    return system
+
 class SpringMassDamper(object):
-    m = 50.0
-    k = 50.0
-    d = 25.0
-    A = np.array([[0, 1],[-k/m, -d/m]]) # state matrix
-    B = np.array([[0],[1/m]]) # input matrix
-
-    def __init__(self, x, x_dot = 0.,  x_ddot = 0., dt = 0.001):
-        self.X = np.array([[x], [x_dot]])
-        self.X_dot = np.array([[x_dot], [x_ddot]])
+    # mass, elasticity, viscosity given as arrays (N,) make a family of N plants
+    # with states (2, N), one column per plant
+    def __init__(self, x, x_dot = 0.,  x_ddot = 0., dt = 0.001, method = 'zoh', mass = 50.0, elasticity = 50.0, viscosity = 25.0):
         self.dT = dt
-        self.u = 0
-    
-    def init_system(self, mass, elasticity, viscocity):
-        self.m = mass
-        self.k = elasticity
-        self.d = viscocity
-        self.A = np.array([[0, 1],[-self.k/self.m, -self.d/self/m]]) # state matrix
-        self.B = np.array([[0],[1/self.m]]) # input matrix
+        self.method = method
+        self.X = self.stack(x, x_dot)
+        self.X_dot = self.stack(x_dot, x_ddot)
+        self.u = np.zeros((1, 1))
+        self.init_system(mass, elasticity, viscosity)
+
+    # (2, N) state of scalar or per-plant (N,) rows
+    @staticmethod
+    def stack(a, b):
+        return np.stack(np.broadcast_arrays(*[np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (a, b)]))
+
+    # A (..., 2, 2), B (..., 2, 1) for scalar or array parameters
+    @staticmethod
+    def matrices(mass, elasticity, viscosity):
+        m, k, d = np.broadcast_arrays(*[np.asarray(v, dtype=np.float64) for v in (mass, elasticity, viscosity)])
+        A = np.zeros(m.shape + (2, 2)) # state matrix
+        A[..., 0, 1] = 1
+        A[..., 1, 0] = -k/m
+        A[..., 1, 1] = -d/m
+        B = np.zeros(m.shape + (2, 1)) # input matrix
+        B[..., 1, 0] = 1/m
+        return A, B
+
+    def init_system(self, mass, elasticity, viscosity):
+        self.family = any(np.ndim(v) > 0 for v in (mass, elasticity, viscosity))
+        if self.family:
+            self.m, self.k, self.d = np.broadcast_arrays(*[np.array(v, dtype=np.float64) for v in (mass, elasticity, viscosity)])
+        else:
+            self.m, self.k, self.d = float(mass), float(elasticity), float(viscosity)
+        self.A, self.B = self.matrices(self.m, self.k, self.d)
+        self.systems = {} # discrete system per (dt, method)
+        self.system = self.discretize(self.dT, self.method)
+        # states of the previous plant(s) spread over the new family
+        N = self.size()
+        self.X = np.array(np.broadcast_to(self.X, (2, N)))
+        self.X_dot = np.array(np.broadcast_to(self.X_dot, (2, N)))
+        self.u = np.array(np.broadcast_to(self.u, (1, N)))
+
+    # discrete system for dt, computed once and cached
+    def discretize(self, dt, method = 'zoh'):
+        if (dt, method) not in self.systems:
+            if self.family:
+                self.systems[(dt, method)] = LinearSystemFamily(self.A, self.B, dt, method)
+            else:
+                self.systems[(dt, method)] = plant_system(self.m, self.k, self.d, dt, method)
+        return self.systems[(dt, method)]
+
+    def set_dt(self, dt):
+        self.dT = dt
+        self.system = self.discretize(dt, self.method)
+
+    def size(self):
+        return np.size(self.m)
 
     def do_action(self, u):
         self.u = u
 
     def update_state(self):
-        self.X_dot = self.A @ self.X + self.B @ self.u
-        self.X = self.X + self.X_dot * self.dT 
+        self.X_dot = self.system.derivative(self.X, self.u)
+        self.X = self.system.step(self.X, self.u)
 
     def get_X(self):
         return self.X
@@ -52,13 +106,9 @@ if __name__ == '__main__':
     time_step = (int) (period / dt)
     plant = SpringMassDamper(0.5, 0.5)
     pid = PID(50, 20, 25)
-    X_history = np.array(plant.get_X())
-    u_history = np.array(plant.get_u())
-    for i in range(time_step-1):
-        plant.do_action(pid.controller(plant.get_X(), x_ref, u))
-        plant.update_state()
-        u_history = np.append(u_history, plant.get_u())
-        X_history = np.append(X_history, plant.get_X(), axis=1)
+    X_history, u_history = plant.system.simulate(plant.get_X(), lambda k, X: pid.controller(X, x_ref, u), time_step)
+    X_history = X_history[:, :, 0].T
+    u_history = u_history[:, 0, 0]
 
     t = np.linspace(0, time_step*dt, time_step)
 
@@ -1,69 +1,181 @@
+import math
+import threading
+from collections import deque
+
 import optuna
 import numpy as np
+from optuna.distributions import FloatDistribution, IntDistribution
+from optuna.trial import TrialState
+
+#
+# Cooling schedules, temperature after `step` accepted-or-rejected moves.
+#
+def exponential_cooling(temperature, step, alpha=0.9):
+    return temperature * alpha ** step
+
+def linear_cooling(temperature, step, rate=1.0, minimum=1e-3):
+    return max(temperature - rate * step, minimum)
+
+def logarithmic_cooling(temperature, step):
+    return temperature / math.log(step + 2)
 
+cooling_schedules = {
+    'exponential': exponential_cooling,
+    'linear': linear_cooling,
+    'logarithmic': logarithmic_cooling,
+}
+
+# The annealing state is kept per sampler instance and fed only by the trials this process
+# finishes. In a storage-backed study shared by several processes every process therefore
+# runs its own annealing chain; the chains share the storage (and study.best_trial) but do
+# not see each other's trials, which would need a scan of the trial list per trial.
 class SimulatedAnnealingSampler(optuna.samplers.BaseSampler):
-    def __init__(self, temperature=100):
-        self._rng = np.random.RandomState()
+    # batch_size : neighbours proposed around the current point at once, e.g. the number of parallel workers
+    # cooling : name in cooling_schedules or a function (initial temperature, step) -> temperature
+    def __init__(self, temperature=100, batch_size=1, cooling='exponential', neighborhood=0.1, seed=None):
+        self._rng = np.random.RandomState(seed)
+        self._initial_temperature = temperature
         self._temperature = temperature  # Current temperature.
-        self._current_trial = None  # Current state.
+        self._cooling = cooling_schedules[cooling] if isinstance(cooling, str) else cooling
+        self._batch_size = batch_size
+        self._neighborhood = neighborhood
+        self._independent_sampler = optuna.samplers.RandomSampler(seed)
+        self._lock = threading.Lock()
+        self._step = 0  # Number of completed trials taken into the annealing.
+        self._sign = None  # 1 to minimize, -1 to maximize.
+        self._current_params = None  # Current state.
+        self._current_value = None
+        self._search_space = None  # Intersection of the distributions of completed trials.
+        self._proposals = deque()  # Neighbours of the current state waiting for a trial.
+
+    # The lock can not be pickled, e.g. when the sampler is sent to a worker process.
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
 
     def sample_relative(self, study, trial, search_space):
         if search_space == {}:
             return {}
 
-        #
-        # An implementation of SA algorithm.
-        #
+        with self._lock:
+            if self._current_params is None or not all(name in self._current_params for name in search_space):
+                return {}
+            if not self._proposals:
+                self._propose(search_space)
+            return self._proposals.popleft()
 
+    #
+    # An implementation of SA algorithm.
+    #
+    # The state is updated once per finished trial from after_trial, so the cost per trial does
+    # not grow with the length of the study.
+    def after_trial(self, study, trial, state, values):
+        self._independent_sampler.after_trial(study, trial, state, values)
+        if state != TrialState.COMPLETE:
+            return
+        with self._lock:
+            if self._sign is None:
+                self._sign = 1.0 if study.direction == optuna.study.StudyDirection.MINIMIZE else -1.0
+            self._update_search_space(trial.distributions)
+            self._anneal(trial.params, self._sign * values[0])
+
+    def _update_search_space(self, distributions):
+        if self._search_space is None:
+            self._search_space = dict(distributions)
+        else:
+            self._search_space = {name: distribution for name, distribution in self._search_space.items()
+                                  if distributions.get(name) == distribution}
+
+    def _anneal(self, params, value):
         # Calculate transition probability.
-        prev_trial = study.trials[-2]
-        if self._current_trial is None or prev_trial.value <= self._current_trial.value:
+        if self._current_value is None or value <= self._current_value:
             probability = 1.0
         else:
-            probability = np.exp((self._current_trial.value - prev_trial.value) / self._temperature)
-        self._temperature *= 0.9  # Decrease temperature.
+            probability = np.exp((self._current_value - value) / self._temperature)
+        self._step += 1
+        self._temperature = self._cooling(self._initial_temperature, self._step)
 
-        # Transit the current state if the previous result is accepted.
+        # Transit the current state if the result is accepted,
+        # neighbours of the old state still waiting are dropped.
         if self._rng.uniform(0, 1) < probability:
-            self._current_trial = prev_trial
+            self._current_params = params
+            self._current_value = value
+            self._proposals.clear()
 
-        # Sample parameters from the neighborhood of the current point.
-        #
-        # The sampled parameters will be used during the next execution of
-        # the objective function passed to the study.
-        params = {}
-        for param_name, param_distribution in search_space.items():
-            if not isinstance(param_distribution, optuna.distributions.UniformDistribution):
-                raise NotImplementedError('Only suggest_uniform() is supported')
+    # Sample a batch of parameters from the neighborhood of the current point.
+    #
+    # The sampled parameters will be used during the next executions of
+    # the objective function passed to the study.
+    def _propose(self, search_space):
+        samples = [{} for _ in range(self._batch_size)]
+        for name, distribution in search_space.items():
+            value = self._current_params[name]
+            if distribution.step is None:
+                values = self._continuous_neighbors(distribution, value)
+            else:
+                values = self._discrete_neighbors(distribution, value)
+            for params, sample in zip(samples, values):
+                params[name] = sample
+        self._proposals.extend(samples)
 
-            current_value = self._current_trial.params[param_name]
-            width = (param_distribution.high - param_distribution.low) * 0.1
-            neighbor_low = max(current_value - width, param_distribution.low)
-            neighbor_high = min(current_value + width, param_distribution.high)
-            params[param_name] = self._rng.uniform(neighbor_low, neighbor_high)
+    def _continuous_neighbors(self, distribution, value):
+        low, high, current = distribution.low, distribution.high, value
+        if distribution.log:
+            low, high, current = np.log(low), np.log(high), np.log(current)
+        width = (high - low) * self._neighborhood
+        samples = self._rng.uniform(max(current - width, low), min(current + width, high), self._batch_size)
+        if distribution.log:
+            samples = np.exp(samples)
+        return [float(min(max(v, distribution.low), distribution.high)) for v in samples]
 
-        return params
+    # Integer offsets of at least one step, so a parameter with few steps in the
+    # neighborhood width can still move.
+    def _discrete_neighbors(self, distribution, value):
+        step = distribution.step
+        count = int(round((distribution.high - distribution.low) / step))
+        index = int(round((value - distribution.low) / step))
+        if distribution.log:
+            # int with log=True has step 1, the width is relative to the value
+            reach = value * (np.exp((np.log(distribution.high) - np.log(distribution.low)) * self._neighborhood) - 1)
+        else:
+            reach = (distribution.high - distribution.low) * self._neighborhood / step
+        reach = max(1, int(np.ceil(reach)))
+        indices = np.clip(index + self._rng.randint(-reach, reach + 1, self._batch_size), 0, count)
+        samples = distribution.low + indices * step
+        if isinstance(distribution, IntDistribution):
+            return [int(v) for v in samples]
+        return [float(v) for v in samples]
 
     #
     # The rest is boilerplate code and unrelated to SA algorithm.
     #
+    # Parameters other than float and int ones are left to the independent sampler.
     def infer_relative_search_space(self, study, trial):
-        return optuna.samplers.intersection_search_space(study)
+        with self._lock:
+            if self._search_space is None:
+                return {}
+            return {name: distribution for name, distribution in self._search_space.items()
+                    if isinstance(distribution, (FloatDistribution, IntDistribution))}
 
     def sample_independent(self, study, trial, param_name, param_distribution):
-        independent_sampler = optuna.samplers.RandomSampler()
-        return independent_sampler.sample_independent(study, trial, param_name, param_distribution)
+        return self._independent_sampler.sample_independent(study, trial, param_name, param_distribution)
 
 def objective(trial):
-        x = trial.suggest_uniform('x', -10, 10)
-        y = trial.suggest_uniform('y', -5, 5)
+        x = trial.suggest_float('x', -10, 10)
+        y = trial.suggest_float('y', -5, 5)
         return x** 2 + y
 
 if __name__ == '__main__':
-    sampler = SimulatedAnnealingSampler()
+    n_jobs = 4
+    sampler = SimulatedAnnealingSampler(batch_size=n_jobs, seed=0)
     study = optuna.create_study(sampler=sampler)
-    study.optimize(objective, n_trials=100)
+    study.optimize(objective, n_trials=100, n_jobs=n_jobs)
 
     print(study.best_params)
     print(study.best_value)
-    # print(study.best_trial)
\ No newline at end of file
+    # print(study.best_trial)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import time
+import numpy as np
+
+from serial_chain import PlanarChain, SpatialChain
+from lmik import ARM2DOF, LMIK
+from lmik_3d import ARM3DOF
+
+def puma_like():
+    return SpatialChain.from_table([[0, 0, 1, 0.0, 0, 0.3],
+                                    [0, 1, 0, 0.4, 0, 0.0],
+                                    [0, 1, 0, 0.4, 0, 0.0],
+                                    [1, 0, 0, 0.0, 0, 0.1],
+                                    [0, 1, 0, 0.1, 0, 0.0],
+                                    [1, 0, 0, 0.05, 0, 0.0]])
+
+robots = {
+    'arm2dof': ARM2DOF,
+    'arm3dof': ARM3DOF,
+    'planar6': lambda: PlanarChain(np.full(6, 0.5)),
+    'planar7': lambda: PlanarChain(np.full(7, 0.5)),
+    'spatial6': puma_like,
+}
+
+# solver(ik, q, pd) solves q in place and returns the iterations it used
+def solve_lm(ik, q, pd):
+    ik.inverse_kinematics(q, pd)
+    return ik.iteration
+
+def solve_auto(ik, q, pd):
+    ik.solve(q, pd)
+    return ik.iteration
+
+def solve_inplace(ik, q, pd):
+    ik.inverse_kinematics_inplace(q, pd)
+    return ik.iteration
+
+solvers = {
+    'lm': solve_lm,
+    'inplace': solve_inplace,
+    'solve': solve_auto,
+}
+
+def reach(robot):
+    pos = robot.joint_positions(np.zeros(robot.joint_dof()))
+    return np.sum(np.linalg.norm(np.diff(pos, axis=0), axis=1))
+
+def make_targets(robot, n, rng):
+    dof = robot.joint_dof()
+    q_goal = rng.uniform(-np.pi, np.pi, (n, dof))
+    reachable = robot.kinematics_batch(q_goal)
+    # uniformly oriented points beyond full extension
+    direction = rng.normal(size=(n, robot.task_dof()))
+    direction /= np.linalg.norm(direction, axis=1)[:, np.newaxis]
+    base = robot.joint_positions(np.zeros(dof))[0]
+    unreachable = base + direction * reach(robot) * rng.uniform(1.1, 1.5, (n, 1))
+    seed = rng.uniform(-np.pi, np.pi, (n, dof))
+    return {'reachable': reachable, 'unreachable': unreachable}, seed
+
+def summarize(latency, iteration, residual, converged, total):
+    latency = np.asarray(latency) * 1e6
+    return {
+        'samples': int(latency.size),
+        'latency_p50_us': float(np.percentile(latency, 50)),
+        'latency_p99_us': float(np.percentile(latency, 99)),
+        'iteration_mean': float(np.mean(iteration)),
+        'iteration_p99': float(np.percentile(iteration, 99)),
+        'converged_rate': float(np.mean(converged)),
+        'residual_p50': float(np.percentile(residual, 50)),
+        'residual_max': float(np.max(residual)),
+        'solves_per_sec': float(latency.size / total),
+    }
+
+def run_solver(robot, solver, targets, seed):
+    ik = LMIK(robot)
+    n = targets.shape[0]
+    latency = np.empty(n)
+    iteration = np.empty(n)
+    residual = np.empty(n)
+    start = time.perf_counter()
+    for i in range(n):
+        q = seed[i].reshape(-1, 1).copy()
+        pd = targets[i].reshape(-1, 1)
+        t0 = time.perf_counter()
+        iteration[i] = solver(ik, q, pd)
+        latency[i] = time.perf_counter() - t0
+        residual[i] = ik.evaluate(pd - robot.kinematics(q))[0][0]
+    total = time.perf_counter() - start
+    return summarize(latency, iteration, residual, residual < ik.EPS, total)
+
+def run_batch(robot, targets, seed):
+    ik = LMIK(robot)
+    t0 = time.perf_counter()
+    q, converged = ik.inverse_kinematics_batch(seed, targets)
+    total = time.perf_counter() - t0
+    residual = ik.evaluate_batch(targets - robot.kinematics_batch(q))
+    n = targets.shape[0]
+    return {
+        'samples': int(n),
+        'total_sec': total,
+        'converged_rate': float(np.mean(converged)),
+        'residual_p50': float(np.percentile(residual, 50)),
+        'residual_max': float(np.max(residual)),
+        'solves_per_sec': float(n / total),
+    }
+
+def benchmark(robot_names, solver_names, n, seed_value):
+    result = {'samples': n, 'seed': seed_value, 'EPS': LMIK.EPS, 'robots': {}}
+    for name in robot_names:
+        robot = robots[name]()
+        rng = np.random.default_rng(seed_value)
+        target_sets, seed = make_targets(robot, n, rng)
+        result['robots'][name] = {}
+        for set_name, targets in target_sets.items():
+            report = {}
+            for solver_name in solver_names:
+                report[solver_name] = run_solver(robot, solvers[solver_name], targets, seed)
+            report['batch'] = run_batch(robot, targets, seed)
+            result['robots'][name][set_name] = report
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='LMIK benchmark')
+    parser.add_argument('-n', '--samples', type=int, default=1000)
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-r', '--robots', nargs='+', default=list(robots), choices=list(robots))
+    parser.add_argument('--solvers', nargs='+', default=list(solvers), choices=list(solvers))
+    parser.add_argument('-o', '--output', default=None, help='json file (default: stdout)')
+    args = parser.parse_args()
+
+    result = benchmark(args.robots, args.solvers, args.samples, args.seed)
+    if args.output is None:
+        print(json.dumps(result, indent=2))
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
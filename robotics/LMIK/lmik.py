@@ -1,127 +1,263 @@
 #!/usr/bin/env python3
+import os
+import sys
+import time
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
+from scipy.linalg.lapack import dpotrf, dpotrs
 
-class ARM2DOF(object):
-    joint_dof_ = 2
-    task_dof_ = 2
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'simulation'))
+from playback import Playback
+
+from serial_chain import PlanarChain
+from trajectory_ik import TrajectoryIK
+from timing import TimingHistogram
+
+class ARM2DOF(PlanarChain):
     L1 = 1
     L2 = 1
 
     def __init__(self):
-        a = 0
-    
-    def kinematics(self, q):
-        x = np.zeros((self.task_dof_, 1))
-        x[0][0] = self.L1*np.cos(q[0][0]) + self.L2*np.cos(q[0][0] + q[1][0])
-        x[1][0] = self.L1*np.sin(q[0][0]) + self.L2*np.sin(q[0][0] + q[1][0])
-        return x
-
-    def jacobian(self, q):
-        jacob = np.zeros((self.task_dof_, self.joint_dof_))
-        jacob[0][0] = -self.L1*np.sin(q[0][0]) - self.L2*np.sin(q[0][0] + q[1][0])
-        jacob[0][1] = -self.L2*np.sin(q[0][0] + q[1][0])
-        jacob[1][0] =  self.L1*np.cos(q[0][0]) + self.L2*np.cos(q[0][0] + q[1][0])
-        jacob[1][1] =  self.L2*np.cos(q[0][0] + q[1][0])
-        return jacob
-
-    def joint_dof(self):
-        return self.joint_dof_
-
-    def task_dof(self):
-        return self.task_dof_
+        super().__init__([self.L1, self.L2])
 
     def joint2pos(self, q):
-        x = np.zeros((self.task_dof_,1))
-        x[0][0] = self.L1*np.cos(q[0][0]) + self.L2*np.cos(q[0][0] + q[1][0])
-        x[1][0] = self.L1*np.sin(q[0][0]) + self.L2*np.sin(q[0][0] + q[1][0])
-        return x
+        return self.jointpos(q, 2)
 
     def joint1pos(self, q):
-        x = np.zeros((self.task_dof_,1))
-        x[0][0] = self.L1*np.cos(q[0][0])
-        x[1][0] = self.L1*np.sin(q[0][0])
-        return x
+        return self.jointpos(q, 1)
+
+# closed-form solutions of a 2-link planar arm
+# return the elbow-up/elbow-down solutions ordered by distance from q_, empty if unreachable
+def arm2dof_analytic_ik(robot, q_, pd):
+    L1, L2 = robot.link_length
+    x = pd[0][0]
+    y = pd[1][0]
+    c2 = (x**2 + y**2 - L1**2 - L2**2) / (2*L1*L2)
+    if abs(c2) > 1 + 1e-9:
+        return []
+    q2 = np.arccos(np.clip(c2, -1, 1)) * np.array([1., -1.])
+    q1 = np.arctan2(y, x) - np.arctan2(L2*np.sin(q2), L1 + L2*np.cos(q2))
+    q = np.array([q1, q2])
+    # unwrap around the seed
+    q = q_ + (q - q_ + np.pi) % (2*np.pi) - np.pi
+    order = np.argsort(np.sum((q - q_)**2, axis=0))
+    return [q[:, i:i+1] for i in order]
 
 
 
 class LMIK(object):
     EPS = 1E-5
-    def __init__(self, robot_):
+    DIVERGE_RATIO = 1E3 # error growth over the best value treated as divergence
+    CONVERGED = 'converged'
+    BUDGET_EXHAUSTED = 'budget_exhausted'
+    DIVERGED = 'diverged'
+    analytic_solver = {} # robot class -> closed-form solver(robot, q, pd) -> solutions nearest first
+
+    # inplace : use the allocation-free solver in solve()
+    #           (robot.kinematics must accept an output buffer)
+    def __init__(self, robot_, inplace = False):
         self.robot = robot_
+        self.analytic = self.find_analytic(type(robot_))
+        self.iterative = self.inverse_kinematics_inplace if inplace else self.inverse_kinematics
+        self.stats = {'analytic': 0, 'lm': 0, 'fallback': 0}
+        self.iteration = 0 # iterations used by the last solve
+        self.timing = TimingHistogram() # solve_realtime wall-clock time
+        self.status_count = {self.CONVERGED: 0, self.BUDGET_EXHAUSTED: 0, self.DIVERGED: 0}
         w_E = 1
         daig_w_E = np.full(self.robot.task_dof(), w_E)
         self.W_E = np.diag(daig_w_E)
         w_N_ = 0.001
         daig_w_N_ = np.full(self.robot.joint_dof(), w_N_)
         self.W_N_ = np.diag(daig_w_N_)
+        self.I = np.identity(self.robot.joint_dof())
+        self.init_workspace()
+
+    # buffers of inverse_kinematics_inplace, call again after changing W_E
+    def init_workspace(self):
+        task_dof = self.robot.task_dof()
+        joint_dof = self.robot.joint_dof()
+        self.W_E_identity = np.array_equal(self.W_E, np.identity(task_dof))
+        self._x = np.zeros((task_dof, 1))
+        self._e = np.zeros((task_dof, 1))
+        self._We = np.zeros((task_dof, 1))
+        self._JtW = np.zeros((joint_dof, task_dof))
+        self._H = np.zeros((joint_dof, joint_dof), order='F')
+        self._g = np.zeros((joint_dof, 1), order='F')
+        self._H_diag = self._H.reshape(-1, order='F')[::joint_dof+1] # view of the diagonal
+        self._q_best = np.zeros((joint_dof, 1))
     
+    @classmethod
+    def register_analytic(cls, robot_class, solver):
+        cls.analytic_solver[robot_class] = solver
+
+    @classmethod
+    def find_analytic(cls, robot_class):
+        for c in robot_class.__mro__:
+            if c in cls.analytic_solver:
+                return cls.analytic_solver[c]
+        return None
+
+    def within_limit(self, q):
+        limit = getattr(self.robot, 'joint_limit', None)
+        if limit is None:
+            return True
+        return np.all((q[:, 0] >= limit[:, 0]) & (q[:, 0] <= limit[:, 1]))
+
+    # nearest closed-form solution within the joint limits when the robot class has a solver,
+    # iterative LM otherwise or when no solution fits
+    def solve(self, q_, pd):
+        if self.analytic is not None:
+            for q in self.analytic(self.robot, q_, pd):
+                if self.within_limit(q):
+                    self.stats['analytic'] += 1
+                    self.iteration = 0
+                    q_[:] = q
+                    return q_
+            self.stats['fallback'] += 1
+        self.stats['lm'] += 1
+        return self.iterative(q_, pd)
+
+    def reset_stats(self):
+        for key in self.stats:
+            self.stats[key] = 0
+
     def evaluate(self, e):
         value = e.transpose() @ self.W_E @ e / 2 
         return value
 
+    def evaluate_batch(self, e):
+        return np.einsum('ni,ij,nj->n', e, self.W_E, e) / 2
+
     def inverse_kinematics(self, q_, pd):
         q = q_
         e = pd - self.robot.kinematics(q)
         for k in range(100):
             jacob = self.robot.jacobian(q)
-            W_N = self.evaluate(e) * np.identity(self.robot.joint_dof()) + self.W_N_
+            W_N = self.evaluate(e) * self.I + self.W_N_
             H = jacob.transpose() @ self.W_E @ jacob + W_N
             g = jacob.transpose() @ self.W_E @ e
-            q += np.linalg.inv(H) @ g
+            q += np.linalg.solve(H, g)
             e = pd - self.robot.kinematics(q)
             if self.evaluate(e) < self.EPS:
                 break
+        self.iteration = k + 1
         return q
 
+    def evaluate_inplace(self, e):
+        if self.W_E_identity:
+            return np.dot(e[:, 0], e[:, 0]) / 2
+        np.matmul(self.W_E, e, out=self._We)
+        return np.dot(e[:, 0], self._We[:, 0]) / 2
 
+    # same iteration as inverse_kinematics on preallocated buffers,
+    # solving the SPD system H dq = g by Cholesky
+    def inverse_kinematics_inplace(self, q, pd):
+        value = self.error_inplace(q, pd)
+        for k in range(100):
+            value = self.step_inplace(q, pd, value)
+            if value < self.EPS:
+                break
+        self.iteration = k + 1
+        return q
 
-def video(robot, q1, q2, t, fig):
+    def error_inplace(self, q, pd):
+        np.subtract(pd, self.robot.kinematics(q, self._x), out=self._e)
+        return self.evaluate_inplace(self._e)
+
+    # one damped LM update of q, return the new error value
+    def step_inplace(self, q, pd, value):
+        e = self._e
+        H = self._H
+        g = self._g
+        jacob = self.robot.jacobian(q)
+        if self.W_E_identity:
+            np.matmul(jacob.T, jacob, out=H)
+            np.matmul(jacob.T, e, out=g)
+        else:
+            np.matmul(jacob.T, self.W_E, out=self._JtW)
+            np.matmul(self._JtW, jacob, out=H)
+            np.matmul(self._JtW, e, out=g)
+        H += self.W_N_
+        self._H_diag += value
+        c, info = dpotrf(H, overwrite_a=1)
+        dq, info = dpotrs(c, g, overwrite_b=1)
+        q += dq
+        return self.error_inplace(q, pd)
+
+    # bounded solve for control loops
+    # deadline : absolute time.perf_counter() value, max_iteration : iteration budget
+    # return best q found (written into q_), status and its error value
+    def solve_realtime(self, q_, pd, deadline = None, max_iteration = 100):
+        start = time.perf_counter()
+        q = q_
+        q_best = self._q_best
+        value = self.error_inplace(q, pd)
+        value_best = value
+        q_best[:] = q
+        status = self.CONVERGED if value < self.EPS else self.BUDGET_EXHAUSTED
+        k = 0
+        step_time = 0.
+        while status != self.CONVERGED and k < max_iteration:
+            now = time.perf_counter()
+            # stop if the next iteration would not finish in time
+            if deadline is not None and now + step_time > deadline:
+                break
+            value = self.step_inplace(q, pd, value)
+            step_time = time.perf_counter() - now
+            k += 1
+            if not np.isfinite(value) or value > self.DIVERGE_RATIO * value_best:
+                status = self.DIVERGED
+                break
+            if value < value_best:
+                value_best = value
+                q_best[:] = q
+            if value < self.EPS:
+                status = self.CONVERGED
+        q[:] = q_best
+        self.iteration = k
+        self.status_count[status] += 1
+        self.timing.record(time.perf_counter() - start)
+        return q, status, value_best
+
+    # q_ : (N, joint_dof) seeds, pd : (N, task_dof) targets
+    # return solutions and per-sample convergence mask
+    def inverse_kinematics_batch(self, q_, pd):
+        q = np.array(q_, dtype=np.float64)
+        pd = np.asarray(pd, dtype=np.float64)
+        e = pd - self.robot.kinematics_batch(q)
+        value = self.evaluate_batch(e)
+        active = np.ones(q.shape[0], dtype=bool)
+        for k in range(100):
+            idx = np.flatnonzero(active)
+            if idx.size == 0:
+                break
+            jacob = self.robot.jacobian_batch(q[idx])
+            jacob_t = jacob.transpose(0, 2, 1) @ self.W_E
+            W_N = value[idx, np.newaxis, np.newaxis] * self.I + self.W_N_
+            H = jacob_t @ jacob + W_N
+            g = jacob_t @ e[idx, :, np.newaxis]
+            q[idx] += np.linalg.solve(H, g)[:, :, 0]
+            e[idx] = pd[idx] - self.robot.kinematics_batch(q[idx])
+            value[idx] = self.evaluate_batch(e[idx])
+            active[idx] = value[idx] >= self.EPS
+        return q, ~active
+
+LMIK.register_analytic(ARM2DOF, arm2dof_analytic_ik)
+
+
+
+def video(robot, q1, q2, t, fig, decimate = 1, path = "output.gif"):
     alpha = 0.2
     ax = fig.add_subplot(222, aspect='equal', ylabel='y', xlabel='x', xlim=(-2.0-alpha, 2.0+alpha), ylim=(-2.0-alpha, 2.0+alpha))
     ax.grid()
 
-    time_text = ax.text(0.02, 1.1, 'time = 0.0', transform=ax.transAxes)
-
-    #link
-    link1, = ax.plot([], [], '-r', lw=2)
-    link2, = ax.plot([], [], '-r', lw=2)
-
-    # joint circle
-    joint1, = ax.plot([], [], '-r', lw=2)
-    joint2, = ax.plot([], [], '-r', lw=2)
-    base, = ax.plot([], [], '-r', lw=2)
-    radius = 0.1
-    angles = np.arange(0.0, np.pi * 2.0, np.radians(3.0))
-    ox = radius * np.cos(angles) 
-    oy = radius * np.sin(angles)
-
-    def init():
-        link1.set_data([], [])
-        link2.set_data([], [])
-        joint1.set_data([], [])
-        joint2.set_data([], [])
-        base.set_data([], [])
-        time_text.set_text('')
-        return time_text
-
-    def animate(i):
-        q = np.array([[q1[i]],[q2[i]]])
-        j1 = robot.joint1pos(q)
-        j2 = robot.joint2pos(q)
-        link1.set_data([0, j1[0][0]], [0, j1[1][0]])
-        link2.set_data([j1[0][0], j2[0][0]], [j1[1][0], j2[1][0]])
-        joint1.set_data([ox + j1[0][0]],[ oy + j1[1][0]])
-        joint2.set_data([ox + j2[0][0]],[ oy + j2[1][0]])
-        base.set_data([ox + 0],[ oy + 0])
-        time_text.set_text('time = {0:.2f}'.format(i*t))
-        return time_text
-
-    ani = animation.FuncAnimation(fig, animate, frames=range(200),
-                                  interval=t*100, blit=False, init_func=init)
-    #plt.show()
-    ani.save("output.gif", writer="imagemagick")
+    # link and joint geometry of every frame
+    pos = robot.joint_positions_batch(np.stack((q1, q2), axis=1))
+    play = Playback(ax, np.arange(len(q1)) * t)
+    play.line(pos, '-r', lw=2)
+    play.circles(pos, 0.1, '-r', lw=2)
+    play.text(0.02, 0.92)
+    play.save(fig, path, decimate)
 
 def plan_orbit1(x):
     y = -1/2*(x**2) + 2
@@ -131,31 +267,25 @@ def plan_orbit2(x):
     y = -np.sqrt(4 - x**2)
     return y
 
+def orbit_targets(step):
+    x = np.linspace(2, -2, step)
+    yield np.array([[x[0]], [plan_orbit1(x[0])]])
+    for i in range(step-1):
+        yield np.array([[x[i]], [plan_orbit1(x[i])]])
+    x = np.linspace(-2, 2, step)
+    for i in range(step):
+        yield np.array([[x[i]], [plan_orbit2(x[i])]])
+
 if __name__ == '__main__':
     dt = 0.01
     step = 100
     robot = ARM2DOF()
     IK = LMIK(robot)
 
-    x = np.linspace(2, -2, step)
-    X = np.array([[x[0]], [plan_orbit1(x[0])]])
-    q = np.zeros((2, 1))
-    X_history = np.array(X)
-    q = IK.inverse_kinematics(q, X)
-    q_history = np.array(q)
-    for i in range(step-1):
-        X = np.array([[x[i]], [plan_orbit1(x[i])]])
-        X_history = np.append(X_history, X, axis=1)
-        q = IK.inverse_kinematics(q, X)
-        # print(q)
-        q_history = np.append(q_history, q, axis=1)
-
-    x = np.linspace(-2, 2, step)
-    for i in range(step):
-        X = np.array([[x[i]], [plan_orbit2(x[i])]])
-        X_history = np.append(X_history, X, axis=1)
-        q = IK.inverse_kinematics(q, X)
-        q_history = np.append(q_history, q, axis=1)
+    with TrajectoryIK(IK, 2*step) as tracker:
+        X_history, q_history = tracker.run(orbit_targets(step), np.zeros((2, 1)))
+    X_history = X_history.T
+    q_history = q_history.T
 
     t = np.arange(0, 2*step*dt, dt)
 
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import numpy as np
+from scipy.spatial import cKDTree
+
+class SeedIndex(object):
+    def __init__(self, position, q):
+        self.position = position # (M, task_dof) end-effector positions
+        self.q = q # (M, joint_dof) joint configurations
+        self.tree = cKDTree(position)
+
+    # sample the joint space once and keep well-conditioned configurations
+    @classmethod
+    def build(cls, robot, samples = 100000, seed = 0, manipulability = 1e-2):
+        rng = np.random.default_rng(seed)
+        limit = getattr(robot, 'joint_limit', None)
+        if limit is None:
+            limit = np.tile([-np.pi, np.pi], (robot.joint_dof(), 1))
+        q = rng.uniform(limit[:, 0], limit[:, 1], (samples, robot.joint_dof()))
+        jacob = robot.jacobian_batch(q)
+        w = np.sqrt(np.abs(np.linalg.det(jacob @ jacob.transpose(0, 2, 1))))
+        q = q[w > manipulability]
+        return cls(robot.kinematics_batch(q), q)
+
+    # .npy keeps [position, q] rows in one array so it can be memory-mapped,
+    # after a header row starting with task_dof
+    def save(self, path):
+        if path.endswith('.npy'):
+            task_dof = self.position.shape[1]
+            data = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64,
+                                             shape=(self.position.shape[0] + 1, task_dof + self.q.shape[1]))
+            data[0] = 0
+            data[0, 0] = task_dof
+            data[1:, :task_dof] = self.position
+            data[1:, task_dof:] = self.q
+            data.flush()
+        else:
+            np.savez(path, position=self.position, q=self.q)
+
+    # task_dof, when given, is checked against the one stored in a .npy file
+    @classmethod
+    def load(cls, path, task_dof = None):
+        if path.endswith('.npy'):
+            data = np.load(path, mmap_mode='r')
+            stored = int(data[0, 0])
+            if task_dof is not None and task_dof != stored:
+                raise ValueError('{0} has task_dof {1}, not {2}'.format(path, stored, task_dof))
+            return cls(data[1:, :stored], data[1:, stored:])
+        data = np.load(path)
+        return cls(data['position'], data['q'])
+
+    def seed(self, pd):
+        _, i = self.tree.query(np.ravel(pd))
+        return np.array(self.q[i]).reshape(-1, 1)
+
+    def seed_batch(self, pd):
+        _, i = self.tree.query(pd)
+        return np.array(self.q[i])
+
+    def solve(self, ik, pd):
+        return ik.solve(self.seed(pd), pd)
+
+if __name__ == '__main__':
+    import time
+    from lmik import LMIK
+    from lmik_3d import ARM3DOF
+
+    robot = ARM3DOF()
+    IK = LMIK(robot)
+    index = SeedIndex.build(robot, 20000)
+    index.save('arm3dof_seed.npy')
+    index = SeedIndex.load('arm3dof_seed.npy')
+
+    rng = np.random.default_rng(1)
+    targets = robot.kinematics_batch(rng.uniform(-np.pi, np.pi, (200, robot.joint_dof())))
+    for name, seed in (('zeros', lambda pd: np.zeros((robot.joint_dof(), 1))), ('index', index.seed)):
+        iteration = 0
+        start = time.perf_counter()
+        for pd in targets:
+            IK.solve(seed(pd), pd.reshape(-1, 1))
+            iteration += IK.iteration
+        print('{0}: {1:.2f} iterations/solve, {2:.3f} sec'.format(name, iteration/len(targets), time.perf_counter()-start))
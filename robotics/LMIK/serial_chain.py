@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+import numpy as np
+
+class PlanarChain(object):
+    task_dof_ = 2
+
+    # joint_limit : (n, 2) array of [lower, upper], None for no limit
+    def __init__(self, link_length, joint_limit = None):
+        self.link_length = np.asarray(link_length, dtype=np.float64).ravel()
+        self.joint_dof_ = self.link_length.size
+        self.joint_limit = None if joint_limit is None else np.asarray(joint_limit, dtype=np.float64)
+        n = self.joint_dof_
+
+        # work buffers, reused on every call
+        self._q = np.full(n, np.nan)
+        self._theta = np.zeros(n)
+        self._trig = np.zeros(n)
+        self._link = np.zeros((n, self.task_dof_))
+        self._pos = np.zeros((n + 1, self.task_dof_)) # joint positions, row 0 is base
+        self._jacob = np.zeros((self.task_dof_, n))
+
+    def joint_dof(self):
+        return self.joint_dof_
+
+    def task_dof(self):
+        return self.task_dof_
+
+    def forward(self, q):
+        q = np.asarray(q, dtype=np.float64).ravel()
+        if np.array_equal(q, self._q):
+            return
+        self._q[:] = q
+        np.cumsum(q, out=self._theta)
+        np.cos(self._theta, out=self._trig)
+        np.multiply(self.link_length, self._trig, out=self._link[:, 0])
+        np.sin(self._theta, out=self._trig)
+        np.multiply(self.link_length, self._trig, out=self._link[:, 1])
+        np.cumsum(self._link, axis=0, out=self._pos[1:])
+        # column i = z x (p_tip - p_i)
+        np.subtract(self._pos[-1, 1], self._pos[:-1, 1], out=self._jacob[0])
+        np.negative(self._jacob[0], out=self._jacob[0])
+        np.subtract(self._pos[-1, 0], self._pos[:-1, 0], out=self._jacob[1])
+
+    def kinematics(self, q, out = None):
+        self.forward(q)
+        if out is None:
+            return self._pos[-1].reshape(self.task_dof_, 1).copy()
+        out[:, 0] = self._pos[-1]
+        return out
+
+    # returned array is a work buffer, overwritten by the next call
+    def jacobian(self, q):
+        self.forward(q)
+        return self._jacob
+
+    def joint_positions(self, q):
+        self.forward(q)
+        return self._pos.copy()
+
+    def jointpos(self, q, i):
+        self.forward(q)
+        return self._pos[i].reshape(self.task_dof_, 1).copy()
+
+    # batched versions: q is (N, joint_dof)
+    def kinematics_batch(self, q):
+        theta = np.cumsum(q, axis=1)
+        x = np.empty((q.shape[0], self.task_dof_))
+        x[:, 0] = np.cos(theta) @ self.link_length
+        x[:, 1] = np.sin(theta) @ self.link_length
+        return x
+
+    def jacobian_batch(self, q):
+        theta = np.cumsum(q, axis=1)
+        jacob = np.empty((q.shape[0], self.task_dof_, self.joint_dof_))
+        # p_tip - p_i is the reversed cumulative sum of the link vectors
+        link = self.link_length * np.sin(theta)
+        jacob[:, 0, :] = -np.cumsum(link[:, ::-1], axis=1)[:, ::-1]
+        link = self.link_length * np.cos(theta)
+        jacob[:, 1, :] = np.cumsum(link[:, ::-1], axis=1)[:, ::-1]
+        return jacob
+
+    def joint_positions_batch(self, q):
+        theta = np.cumsum(q, axis=1)
+        pos = np.zeros((q.shape[0], self.joint_dof_ + 1, self.task_dof_))
+        np.cumsum(self.link_length * np.cos(theta), axis=1, out=pos[:, 1:, 0])
+        np.cumsum(self.link_length * np.sin(theta), axis=1, out=pos[:, 1:, 1])
+        return pos
+
+class SpatialChain(object):
+    task_dof_ = 3
+
+    # axis : (n, 3) joint axes in the local frame of each joint
+    # offset : (n, 3) vector from joint i to joint i+1 (or tip) in the frame of joint i
+    def __init__(self, axis, offset, base = (0., 0., 0.), joint_limit = None):
+        axis = np.asarray(axis, dtype=np.float64).reshape(-1, 3)
+        self.axis = axis / np.linalg.norm(axis, axis=1)[:, np.newaxis]
+        self.offset = np.asarray(offset, dtype=np.float64).reshape(-1, 3)
+        self.base = np.asarray(base, dtype=np.float64).ravel()
+        self.joint_limit = None if joint_limit is None else np.asarray(joint_limit, dtype=np.float64)
+        self.joint_dof_ = self.axis.shape[0]
+        n = self.joint_dof_
+
+        # skew matrices for Rodrigues' formula, one per joint
+        self._K = np.zeros((n, 3, 3))
+        self._K[:, 0, 1] = -self.axis[:, 2]
+        self._K[:, 0, 2] =  self.axis[:, 1]
+        self._K[:, 1, 0] =  self.axis[:, 2]
+        self._K[:, 1, 2] = -self.axis[:, 0]
+        self._K[:, 2, 0] = -self.axis[:, 1]
+        self._K[:, 2, 1] =  self.axis[:, 0]
+        self._K2 = self._K @ self._K
+
+        # work buffers, reused on every call
+        self._q = np.full(n, np.nan)
+        self._R = np.zeros((n + 1, 3, 3)) # orientation of each joint frame, row 0 is base
+        self._R[0] = np.identity(3)
+        self._rot = np.zeros((3, 3))
+        self._pos = np.zeros((n + 1, 3))
+        self._pos[0] = self.base
+        self._z = np.zeros((n, 3)) # joint axes in the world frame
+        self._jacob = np.zeros((6, n)) # [linear; angular]
+
+    @classmethod
+    def from_table(cls, table, base = (0., 0., 0.), joint_limit = None):
+        # rows of [ax, ay, az, dx, dy, dz]
+        table = np.asarray(table, dtype=np.float64)
+        return cls(table[:, 0:3], table[:, 3:6], base, joint_limit)
+
+    def joint_dof(self):
+        return self.joint_dof_
+
+    def task_dof(self):
+        return self.task_dof_
+
+    def forward(self, q):
+        q = np.asarray(q, dtype=np.float64).ravel()
+        if np.array_equal(q, self._q):
+            return
+        self._q[:] = q
+        s = np.sin(q)
+        c = 1.0 - np.cos(q)
+        for i in range(self.joint_dof_):
+            np.multiply(s[i], self._K[i], out=self._rot)
+            self._rot += c[i] * self._K2[i]
+            self._rot[0, 0] += 1.0
+            self._rot[1, 1] += 1.0
+            self._rot[2, 2] += 1.0
+            np.matmul(self._R[i], self._rot, out=self._R[i+1])
+            np.matmul(self._R[i], self.axis[i], out=self._z[i])
+            np.matmul(self._R[i+1], self.offset[i], out=self._pos[i+1])
+            self._pos[i+1] += self._pos[i]
+        self._jacob[:3] = np.cross(self._z, self._pos[-1] - self._pos[:-1]).T
+        self._jacob[3:] = self._z.T
+
+    def kinematics(self, q, out = None):
+        self.forward(q)
+        if out is None:
+            return self._pos[-1].reshape(self.task_dof_, 1).copy()
+        out[:, 0] = self._pos[-1]
+        return out
+
+    # returned arrays are work buffers, overwritten by the next call
+    def jacobian(self, q):
+        self.forward(q)
+        return self._jacob[:3]
+
+    def geometric_jacobian(self, q):
+        self.forward(q)
+        return self._jacob
+
+    def orientation(self, q):
+        self.forward(q)
+        return self._R[-1].copy()
+
+    def joint_positions(self, q):
+        self.forward(q)
+        return self._pos.copy()
+
+    def jointpos(self, q, i):
+        self.forward(q)
+        return self._pos[i].reshape(self.task_dof_, 1).copy()
+
+    # batched versions: q is (N, joint_dof)
+    def joint_positions_batch(self, q, return_axis = False):
+        N = q.shape[0]
+        s = np.sin(q)[:, :, np.newaxis, np.newaxis]
+        c = 1.0 - np.cos(q)[:, :, np.newaxis, np.newaxis]
+        rot = np.identity(3) + s * self._K + c * self._K2
+        R = np.broadcast_to(np.identity(3), (N, 3, 3))
+        pos = np.empty((N, self.joint_dof_ + 1, 3))
+        pos[:, 0] = self.base
+        z = np.empty((N, self.joint_dof_, 3))
+        for i in range(self.joint_dof_):
+            z[:, i] = R @ self.axis[i]
+            R = R @ rot[:, i]
+            pos[:, i+1] = pos[:, i] + R @ self.offset[i]
+        if return_axis:
+            return pos, z
+        return pos
+
+    def kinematics_batch(self, q):
+        return self.joint_positions_batch(q)[:, -1]
+
+    def jacobian_batch(self, q):
+        pos, z = self.joint_positions_batch(q, True)
+        return np.cross(z, pos[:, -1:] - pos[:, :-1]).transpose(0, 2, 1)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import time
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+from lmik import LMIK
+from benchmark import robots
+
+# per-process state, set by init_worker
+# an initializer that raises makes the pool respawn the worker forever,
+# so its error is kept here and raised by the first chunk instead
+worker = {}
+
+def attach(name, shape):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+# output : .npy path if output_is_file, otherwise a shared memory name
+def init_worker(robot_name, input_name, input_shape, output, output_shape, output_is_file):
+    try:
+        robot = robots[robot_name]()
+        worker['robot'] = robot
+        worker['ik'] = LMIK(robot)
+        worker['input_shm'], worker['input'] = attach(input_name, input_shape)
+        if output_is_file:
+            worker['output'] = np.load(output, mmap_mode='r+')
+        else:
+            worker['output_shm'], worker['output'] = attach(output, output_shape)
+    except Exception as e:
+        worker['error'] = e
+
+# rows of output : [q, error value]
+def solve_chunk(chunk):
+    if 'error' in worker:
+        raise worker['error']
+    start, stop = chunk
+    task_dof = worker['robot'].task_dof()
+    ik = worker['ik']
+    pd = worker['input'][start:stop, :task_dof]
+    seed = worker['input'][start:stop, task_dof:]
+    q, _ = ik.inverse_kinematics_batch(seed, pd)
+    out = worker['output']
+    out[start:stop, :-1] = q
+    out[start:stop, -1] = ik.evaluate_batch(pd - worker['robot'].kinematics_batch(q))
+    return stop - start
+
+def grid_targets(lower, upper, resolution):
+    axis = [np.linspace(l, u, resolution) for l, u in zip(lower, upper)]
+    return np.stack(np.meshgrid(*axis, indexing='ij'), axis=-1).reshape(-1, len(axis))
+
+# targets : (N, task_dof), seed : (N, joint_dof)
+# output : path of a memory-mapped result in .npy format (any extension), in-memory array if None
+def sweep(robot_name, targets, seed = None, processes = None, output = None, chunk = 4096):
+    robot = robots[robot_name]()
+    task_dof = robot.task_dof()
+    joint_dof = robot.joint_dof()
+    n = targets.shape[0]
+    if seed is None:
+        seed = np.zeros((n, joint_dof))
+
+    input_shape = (n, task_dof + joint_dof)
+    output_shape = (n, joint_dof + 1)
+    input_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(input_shape)) * 8)
+    output_shm = None
+    try:
+        data = np.ndarray(input_shape, dtype=np.float64, buffer=input_shm.buf)
+        data[:, :task_dof] = targets
+        data[:, task_dof:] = seed
+        if output is None:
+            output_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(output_shape)) * 8)
+            result = np.ndarray(output_shape, dtype=np.float64, buffer=output_shm.buf)
+            name = output_shm.name
+        else:
+            result = np.lib.format.open_memmap(output, mode='w+', dtype=np.float64, shape=output_shape)
+            result.flush()
+            name = output
+
+        chunks = [(i, min(i + chunk, n)) for i in range(0, n, chunk)]
+        with mp.get_context().Pool(processes, init_worker,
+                                     (robot_name, input_shm.name, input_shape, name, output_shape, output is not None)) as pool:
+            for _ in pool.imap_unordered(solve_chunk, chunks):
+                pass
+
+        if output is None:
+            result = result.copy()
+        else:
+            result = np.load(output, mmap_mode='r')
+    finally:
+        input_shm.close()
+        input_shm.unlink()
+        if output_shm is not None:
+            output_shm.close()
+            output_shm.unlink()
+    return result[:, :-1], result[:, -1]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='LMIK workspace sweep')
+    parser.add_argument('-r', '--robot', default='arm3dof', choices=list(robots))
+    parser.add_argument('--lower', type=float, nargs='+', default=[-3.5, -3.5])
+    parser.add_argument('--upper', type=float, nargs='+', default=[3.5, 3.5])
+    parser.add_argument('--resolution', type=int, default=300)
+    parser.add_argument('-p', '--processes', type=int, default=os.cpu_count())
+    parser.add_argument('-o', '--output', default=None, help='file of [q, error] rows in .npy format')
+    args = parser.parse_args()
+
+    targets = grid_targets(args.lower, args.upper, args.resolution)
+    start = time.perf_counter()
+    q, value = sweep(args.robot, targets, processes=args.processes, output=args.output)
+    elapsed = time.perf_counter() - start
+    print('{0} targets in {1:.3f} sec ({2:.0f} solves/sec), reachable {3:.1%}'.format(
+        targets.shape[0], elapsed, targets.shape[0] / elapsed, np.mean(value < LMIK.EPS)))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import numpy as np
+
+class TimingHistogram(object):
+    # bounds : bucket upper bounds in seconds, log-spaced 1us..100ms by default
+    def __init__(self, bounds = np.logspace(-6, -1, 16)):
+        self.bounds = np.asarray(bounds, dtype=np.float64)
+        self.counts = np.zeros(self.bounds.size + 1, dtype=np.int64) # last bucket is +Inf
+        self.total = 0.
+        self.count = 0
+        self.max = 0.
+
+    def record(self, sec):
+        self.counts[np.searchsorted(self.bounds, sec)] += 1
+        self.total += sec
+        self.count += 1
+        if sec > self.max:
+            self.max = sec
+
+    def reset(self):
+        self.counts[:] = 0
+        self.total = 0.
+        self.count = 0
+        self.max = 0.
+
+    def percentile(self, p):
+        if self.count == 0:
+            return 0.
+        i = np.searchsorted(np.cumsum(self.counts), p / 100. * self.count)
+        return self.bounds[i] if i < self.bounds.size else self.max
+
+    def snapshot(self):
+        return {
+            'bounds': self.bounds.tolist(),
+            'counts': self.counts.tolist(),
+            'sum': self.total,
+            'count': self.count,
+            'max': self.max,
+        }
+
+    # prometheus text exposition format with cumulative buckets
+    def exposition(self, name, labels = ''):
+        sep = ',' if labels else ''
+        lines = ['# TYPE {0} histogram'.format(name)]
+        cumulative = np.cumsum(self.counts)
+        for bound, c in zip(self.bounds, cumulative):
+            lines.append('{0}_bucket{{{1}{2}le="{3:g}"}} {4}'.format(name, labels, sep, bound, c))
+        lines.append('{0}_bucket{{{1}{2}le="+Inf"}} {3}'.format(name, labels, sep, cumulative[-1]))
+        lines.append('{0}_sum{{{1}}} {2}'.format(name, labels, self.total))
+        lines.append('{0}_count{{{1}}} {2}'.format(name, labels, self.count))
+        return '\n'.join(lines) + '\n'
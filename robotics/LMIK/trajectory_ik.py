@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+import numpy as np
+
+class TrajectoryIK(object):
+    # capacity : rows kept in memory
+    # ring : overwrite the oldest rows instead of failing when full
+    # path : stream every full buffer to a raw float64 file of [X, q] rows
+    def __init__(self, ik, capacity, ring = False, path = None):
+        self.ik = ik
+        self.task_dof = ik.robot.task_dof()
+        self.joint_dof = ik.robot.joint_dof()
+        self.capacity = capacity
+        self.ring = ring
+        self.path = path
+
+        self.buffer = np.empty((capacity, self.task_dof + self.joint_dof))
+        self.X_buffer = self.buffer[:, :self.task_dof]
+        self.q_buffer = self.buffer[:, self.task_dof:]
+        self.head = 0 # next row to write
+        self.size = 0 # valid rows in buffer
+        self.count = 0 # total recorded samples
+        self.file = open(path, 'wb') if path is not None else None
+
+    def record(self, X, q):
+        if self.head == self.capacity:
+            if self.file is not None:
+                self.flush()
+            elif self.ring:
+                self.head = 0
+            else:
+                raise ValueError('history buffer is full ({0} samples)'.format(self.capacity))
+        self.X_buffer[self.head] = X.ravel()
+        self.q_buffer[self.head] = q.ravel()
+        self.head += 1
+        self.size = max(self.size, self.head)
+        self.count += 1
+
+    def flush(self):
+        if self.file is not None and self.head > 0:
+            self.buffer[:self.head].tofile(self.file)
+            self.file.flush()
+            self.head = 0
+            self.size = 0
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def track(self, targets, q0):
+        q = np.array(q0, dtype=np.float64).reshape(self.joint_dof, 1)
+        for X in targets:
+            X = np.asarray(X, dtype=np.float64).reshape(self.task_dof, 1)
+            q = self.ik.solve(q, X) # warm start from previous solution
+            self.record(X, q)
+            yield q.copy()
+
+    # return the whole trajectory when streaming to a file, the in-memory history otherwise
+    def run(self, targets, q0):
+        for q in self.track(targets, q0):
+            pass
+        if self.file is not None:
+            self.flush()
+            return load_history(self.path, self.task_dof, self.joint_dof)
+        return self.history()
+
+    # samples still held in memory, oldest first
+    def history(self):
+        if self.ring and self.size == self.capacity and self.file is None:
+            order = np.roll(np.arange(self.capacity), -self.head)
+            return self.X_buffer[order], self.q_buffer[order]
+        return self.X_buffer[:self.size], self.q_buffer[:self.size]
+
+def load_history(path, task_dof, joint_dof):
+    data = np.memmap(path, dtype=np.float64, mode='r').reshape(-1, task_dof + joint_dof)
+    return data[:, :task_dof], data[:, task_dof:]
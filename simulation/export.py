@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import re
+import sys
+import multiprocessing as mp
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from playback import Playback
+
+# headless rendering of simulation results
+# a job is (name, kind, data) where data is a dict of arrays, written to <directory>/<name>.<ext>
+# figures are bound to an Agg canvas directly, so pyplot and GUI backends are never touched
+
+def new_figure(figsize = (6.4, 4.8), dpi = 100):
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig
+
+# t (T,) and any other (T,) or (k, T) arrays, one line per row -> png
+def render_series(data, path, options):
+    fig = new_figure()
+    ax = fig.add_subplot(111, xlabel='t')
+    t = data['t']
+    for key, value in data.items():
+        if key == 't' or value.ndim == 0 or value.shape[-1] != t.size:
+            continue
+        value = np.atleast_2d(value)
+        for i, row in enumerate(value):
+            ax.plot(t, row, label=key if value.shape[0] == 1 else '{0}[{1}]'.format(key, i))
+    ax.legend()
+    ax.grid()
+    fig.savefig(path)
+
+# planar joint positions points (T, P, 2), or joint angles q (T, n) with link lengths `link` (n,)
+def arm_points(data):
+    if 'points' in data:
+        return data['points']
+    theta = np.cumsum(data['q'], axis=1)
+    link = np.asarray(data['link'], dtype=np.float64)
+    points = np.zeros((theta.shape[0], theta.shape[1] + 1, 2))
+    points[:, 1:] = np.cumsum(link[:, np.newaxis] * np.stack((np.cos(theta), np.sin(theta)), axis=-1), axis=1)
+    return points
+
+# t (T,), arm geometry (see arm_points) -> animation
+def render_arm(data, path, options):
+    points = arm_points(data)
+    reach = np.max(np.abs(points)) + 0.2
+    fig = new_figure()
+    ax = fig.add_subplot(111, aspect='equal', xlabel='x', ylabel='y', xlim=(-reach, reach), ylim=(-reach, reach))
+    ax.grid()
+    play = Playback(ax, data['t'])
+    play.line(points, '-r', lw=2)
+    play.circles(points, 0.1, '-r', lw=2)
+    play.text(0.02, 0.95)
+    play.save(fig, path, options['decimate'])
+
+# t (T,), COG position x (T,), ZMP u (T,), pendulum height -> animation
+def render_pendulum(data, path, options):
+    x = data['x']
+    u = data['u']
+    h = float(data['height'])
+    fig = new_figure()
+    ax = fig.add_subplot(111, aspect='equal', autoscale_on=False,
+                         xlim=(min(x.min(), u.min()) - 1, max(x.max(), u.max()) + 1), ylim=(-0.5, h + 0.5))
+    ax.grid()
+    ground = np.zeros_like(x)
+    top = np.full_like(x, h)
+    play = Playback(ax, data['t'])
+    play.line(np.stack((np.stack((u, ground), axis=1), np.stack((x, top), axis=1)), axis=1), '-r', lw=2)
+    play.circles(np.stack((x, top), axis=1)[:, np.newaxis, :], 0.1, '-r', lw=2)
+    play.rectangle(np.stack((u-0.25/2, ground-0.25/2), axis=1), 0.25, 0.25, ec='r', fill=False, lw=2)
+    play.text(0.02, 0.95)
+    play.save(fig, path, options['decimate'])
+
+# kind : (renderer, animated)
+renderers = {
+    'series': (render_series, False),
+    'arm': (render_arm, True),
+    'pendulum': (render_pendulum, True),
+}
+
+# store a result for a later export run, e.g. from a nightly simulation job
+def save_result(path, kind, **data):
+    np.savez(path, kind=kind, **data)
+
+def load_result(path):
+    with np.load(path) as f:
+        data = {key: f[key] for key in f.files}
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name, str(data.pop('kind')), data
+
+def output_path(directory, name, kind, options):
+    _, animated = renderers[kind]
+    ext = options['format'] if animated else 'png'
+    return os.path.join(directory, '{0}.{1}'.format(re.sub(r'[^\w.-]', '_', name), ext))
+
+# job : (name, kind, data) or the path of a result saved by save_result
+def render_job(args):
+    job, directory, options = args
+    name = job
+    try:
+        if isinstance(job, str):
+            job = load_result(job)
+        name, kind, data = job
+        path = output_path(directory, name, kind, options)
+        renderers[kind][0](data, path, options)
+        return path, None
+    except Exception as e:
+        return name, '{0}: {1}'.format(type(e).__name__, e)
+
+# render all jobs on `processes` workers, return [(path or name, error or None)] in job order
+def export(jobs, directory, processes = None, format = 'gif', decimate = 1):
+    os.makedirs(directory, exist_ok=True)
+    options = {'format': format, 'decimate': decimate}
+    tasks = [(job, directory, options) for job in jobs]
+    if processes == 1:
+        return [render_job(task) for task in tasks]
+    with mp.get_context().Pool(processes) as pool:
+        return list(pool.imap(render_job, tasks, chunksize=1))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='headless plot/animation export of saved results')
+    parser.add_argument('results', nargs='+', help='.npz files written by save_result')
+    parser.add_argument('-o', '--output', default='export')
+    parser.add_argument('-p', '--processes', type=int, default=os.cpu_count())
+    parser.add_argument('-f', '--format', default='gif', help='animation format, gif or a video extension for ffmpeg')
+    parser.add_argument('-d', '--decimate', type=int, default=1)
+    args = parser.parse_args()
+
+    failed = 0
+    for path, error in export(sorted(args.results), args.output, args.processes, args.format, args.decimate):
+        if error is None:
+            print(path)
+        else:
+            failed += 1
+            print('{0} failed, {1}'.format(path, error), file=sys.stderr)
+    sys.exit(1 if failed else 0)
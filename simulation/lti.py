@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+import numpy as np
+from scipy.linalg import expm
+
+# discrete (Ad, Bd) of dX = A X + B u with u held over dt
+# A (..., n, n) and B (..., n, m) may stack several systems
+def discretize(A, B, dt, method = 'zoh'):
+    A = np.atleast_2d(np.asarray(A, dtype=np.float64))
+    B = np.asarray(B, dtype=np.float64).reshape(A.shape[:-1] + (-1,))
+    n = A.shape[-1]
+    m = B.shape[-1]
+    if method == 'zoh':
+        # exact: expm([[A, B], [0, 0]] dt) = [[Ad, Bd], [0, I]]
+        M = np.zeros(A.shape[:-2] + (n + m, n + m))
+        M[..., :n, :n] = A
+        M[..., :n, n:] = B
+        E = expm(M * dt)
+        return E[..., :n, :n], E[..., :n, n:]
+    elif method == 'rk4':
+        # one RK4 step of a linear system is itself a linear map
+        h = A * dt
+        h2 = h @ h
+        h3 = h2 @ h
+        I = np.identity(n)
+        Ad = I + h + h2/2 + h3/6 + h3 @ h/24
+        Bd = (I + h/2 + h2/6 + h3/24) @ B * dt
+        return Ad, Bd
+    elif method == 'euler':
+        return np.identity(n) + A * dt, B * dt
+    raise ValueError('unknown discretization method: {0}'.format(method))
+
+class LinearSystem(object):
+    # states are column vectors (n, 1), or (n, N) for N systems at once
+    def __init__(self, A, B, dt, method = 'zoh'):
+        self.A = np.atleast_2d(np.asarray(A, dtype=np.float64))
+        self.B = np.asarray(B, dtype=np.float64).reshape(self.A.shape[0], -1)
+        self.dt = dt
+        self.method = method
+        self.Ad, self.Bd = discretize(self.A, self.B, dt, method)
+
+    def state_dof(self):
+        return self.A.shape[0]
+
+    def input_dof(self):
+        return self.B.shape[1]
+
+    def step(self, X, u):
+        return self.Ad @ X + self.Bd @ u
+
+    def derivative(self, X, u):
+        return self.A @ X + self.B @ u
+
+    # controller(k, X) -> u, called once per step
+    # return X (steps, n, N) and applied u (steps, m, N)
+    def simulate(self, X0, controller, steps):
+        X0 = np.asarray(X0, dtype=np.float64).reshape(self.state_dof(), -1)
+        X = np.empty((steps,) + X0.shape)
+        U = np.empty((steps, self.input_dof(), X0.shape[1]))
+        Bu = np.empty(X0.shape)
+        X[0] = X0
+        for k in range(steps - 1):
+            U[k] = controller(k, X[k])
+            np.matmul(self.Ad, X[k], out=X[k+1])
+            np.matmul(self.Bd, U[k], out=Bu)
+            X[k+1] += Bu
+        U[-1] = controller(steps - 1, X[-1])
+        return X, U
+
+    # linear state feedback u = u_ref - K (X - x_ref), evaluated in closed form
+    def simulate_feedback(self, X0, K, x_ref, u_ref, steps):
+        X0 = np.asarray(X0, dtype=np.float64).reshape(self.state_dof(), -1)
+        K = np.asarray(K, dtype=np.float64).reshape(self.input_dof(), -1)
+        x_ref = np.asarray(x_ref, dtype=np.float64).reshape(self.state_dof(), -1)
+        u_ref = np.asarray(u_ref, dtype=np.float64).reshape(self.input_dof(), -1)
+        Phi = self.Ad - self.Bd @ K
+        c = self.Bd @ (u_ref + K @ x_ref)
+        X = self.closed_loop(Phi, c, X0, steps)
+        U = u_ref - K @ (X - x_ref)
+        return X, U
+
+    # X[k+1] = Phi X[k] + c for k = 0..steps-1
+    @staticmethod
+    def closed_loop(Phi, c, X0, steps):
+        n = Phi.shape[0]
+        I = np.identity(n)
+        lam, V = np.linalg.eig(Phi)
+        if np.linalg.cond(V) < 1e8 and np.linalg.cond(I - Phi) < 1e8:
+            X_eq = np.linalg.solve(I - Phi, c) # fixed point
+            z = np.linalg.solve(V, X0 - X_eq)
+            power = lam[np.newaxis, :] ** np.arange(steps)[:, np.newaxis]
+            X = np.einsum('ij,kj,j...->ki...', V, power, z)
+            return X.real + X_eq
+        # defective or marginal: step explicitly
+        X = np.empty((steps,) + X0.shape)
+        X[0] = X0
+        for k in range(steps - 1):
+            np.matmul(Phi, X[k], out=X[k+1])
+            X[k+1] += c
+        return X
+
+class LinearSystemFamily(object):
+    # N systems with their own (A, B) stacked as (N, n, n) and (N, n, m),
+    # column k of the states (n, N) and inputs (m, N) belongs to system k
+    def __init__(self, A, B, dt, method = 'zoh'):
+        self.A = np.asarray(A, dtype=np.float64)
+        self.B = np.asarray(B, dtype=np.float64).reshape(self.A.shape[:2] + (-1,))
+        self.dt = dt
+        self.method = method
+        self.Ad, self.Bd = discretize(self.A, self.B, dt, method)
+        # (n, n, N) and (n, m, N) so one step is a broadcast multiply and sum per column
+        self._Ad = np.ascontiguousarray(self.Ad.transpose(1, 2, 0))
+        self._Bd = np.ascontiguousarray(self.Bd.transpose(1, 2, 0))
+
+    def size(self):
+        return self.A.shape[0]
+
+    def state_dof(self):
+        return self.A.shape[1]
+
+    def input_dof(self):
+        return self.B.shape[2]
+
+    def step(self, X, u):
+        return np.sum(self._Ad * X, axis=1) + np.sum(self._Bd * u, axis=1)
+
+    def derivative(self, X, u):
+        return np.einsum('kij,jk->ik', self.A, X) + np.einsum('kij,jk->ik', self.B, u)
+
+    # controller(k, X) -> u (m, N), called once per step
+    # return X (steps, n, N) and applied u (steps, m, N)
+    def simulate(self, X0, controller, steps):
+        X0 = np.broadcast_to(np.asarray(X0, dtype=np.float64).reshape(self.state_dof(), -1), (self.state_dof(), self.size()))
+        X = np.empty((steps,) + X0.shape)
+        U = np.empty((steps, self.input_dof(), self.size()))
+        X[0] = X0
+        for k in range(steps - 1):
+            U[k] = controller(k, X[k])
+            X[k+1] = self.step(X[k], U[k])
+        U[-1] = controller(steps - 1, X[-1])
+        return X, U
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+import subprocess
+import numpy as np
+import matplotlib as mpl
+import matplotlib.animation as animation
+import matplotlib.patches as patches
+from PIL import Image, GifImagePlugin
+
+# sinks for RGBA frames, written without ImageMagick
+# gif frames are streamed to the file as they arrive, mapped onto one palette
+# built from the first frame (the figures here use a handful of fixed colors)
+class GifWriter(object):
+    def __init__(self, path, fps, size):
+        self.file = open(path, 'wb')
+        self.duration = 1000. / fps
+        self.palette = None
+
+    def write(self, frame):
+        image = Image.fromarray(frame).convert('RGB')
+        if self.palette is None:
+            self.palette = image.quantize(256, method=Image.Quantize.FASTOCTREE)
+            header, _ = GifImagePlugin.getheader(self.palette.copy(), info={'loop': 0, 'duration': self.duration, 'optimize': False})
+            self.file.write(b''.join(header))
+        image = image.quantize(palette=self.palette, dither=Image.Dither.NONE)
+        self.file.write(b''.join(GifImagePlugin.getdata(image, duration=self.duration)))
+
+    def close(self):
+        self.file.write(b';') # trailer
+        self.file.close()
+
+class FFMpegWriter(object):
+    def __init__(self, path, fps, size):
+        if not animation.FFMpegWriter.isAvailable():
+            raise RuntimeError('ffmpeg is not available to write {0}'.format(path))
+        command = [mpl.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', '{0}x{1}'.format(*size), '-r', str(fps),
+                   '-i', '-', '-pix_fmt', 'yuv420p', path]
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        self.proc.stdin.write(frame.tobytes())
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+def writer(path, fps, size):
+    if path.endswith('.gif'):
+        return GifWriter(path, fps, size)
+    return FFMpegWriter(path, fps, size)
+
+class Playback(object):
+    # geometry of every frame is given up front as arrays indexed by frame
+    def __init__(self, ax, t):
+        self.ax = ax
+        self.t = np.asarray(t)
+        self.artists = []
+        self.updates = []
+
+    def frame_count(self):
+        return self.t.size
+
+    # points : (T, P, 2) polyline of each frame
+    def line(self, points, *args, **kwargs):
+        artist, = self.ax.plot([], [], *args, **kwargs)
+        self.artists.append(artist)
+        self.updates.append(lambda i: artist.set_data(points[i, :, 0], points[i, :, 1]))
+        return artist
+
+    # centers : (T, M, 2), drawn as one line with NaN breaks between circles
+    def circles(self, centers, radius, *args, **kwargs):
+        angles = np.append(np.arange(0.0, np.pi * 2.0, np.radians(3.0)), np.nan)
+        outline = radius * np.stack((np.cos(angles), np.sin(angles)), axis=1)
+        points = centers[:, :, np.newaxis, :] + outline
+        return self.line(points.reshape(centers.shape[0], -1, 2), *args, **kwargs)
+
+    # xy : (T, 2) lower-left corner of each frame
+    def rectangle(self, xy, width, height, **kwargs):
+        artist = self.ax.add_patch(patches.Rectangle(xy=xy[0], width=width, height=height, **kwargs))
+        self.artists.append(artist)
+        self.updates.append(lambda i: artist.set_xy(xy[i]))
+        return artist
+
+    def text(self, x, y, fmt = 'time = {0:.2f}'):
+        artist = self.ax.text(x, y, '', transform=self.ax.transAxes)
+        self.artists.append(artist)
+        self.updates.append(lambda i: artist.set_text(fmt.format(self.t[i])))
+        return artist
+
+    def update(self, i):
+        for update in self.updates:
+            update(i)
+        return self.artists
+
+    def frames(self, decimate = 1):
+        return range(0, self.frame_count(), decimate)
+
+    def interval(self, decimate = 1):
+        if self.frame_count() < 2:
+            return 100
+        return (self.t[1] - self.t[0]) * 1000 * decimate
+
+    # blitted animation for interactive display
+    def animation(self, fig, decimate = 1):
+        return animation.FuncAnimation(fig, self.update, frames=self.frames(decimate),
+                                       interval=self.interval(decimate), blit=True)
+
+    # RGBA image of every `decimate`-th frame, blitting the artists over a cached background
+    def render(self, fig, decimate = 1):
+        canvas = fig.canvas
+        for artist in self.artists:
+            artist.set_animated(True)
+        try:
+            canvas.draw()
+            background = canvas.copy_from_bbox(fig.bbox)
+            for i in self.frames(decimate):
+                canvas.restore_region(background)
+                self.update(i)
+                for artist in self.artists:
+                    self.ax.draw_artist(artist)
+                yield np.asarray(canvas.buffer_rgba())
+        finally:
+            for artist in self.artists:
+                artist.set_animated(False)
+
+    # stream every `decimate`-th frame into a gif (Pillow) or video (ffmpeg) file
+    def save(self, fig, path, decimate = 1, fps = None):
+        if fps is None:
+            fps = 1000. / self.interval(decimate)
+        width, height = fig.canvas.get_width_height(physical=True)
+        output = writer(path, fps, (width, height))
+        try:
+            for frame in self.render(fig, decimate):
+                output.write(frame)
+        finally:
+            output.close()